@@ -1,15 +1,31 @@
 from fastapi import FastAPI
+from fastapi.middleware.gzip import GZipMiddleware
 from routers.backup import router as backup_router
 from routers.ui import router as ui_router
 from routers.portfolio import router as portfolio_router
 from routers.tickers import router as tickers_router
 from routers.import_export import router as import_export_router
 from routers.charts import router as charts_router
-from backup_utils import load_latest_backup_on_startup
+from backup_utils import (
+    load_latest_backup_on_startup,
+    load_quote_store,
+    start_price_client,
+    stop_price_client,
+)
 from routers.config import router as config_router
+from routers.prices import router as prices_router
+from routers.history import router as history_router
+from routers.api import router as api_router
+from core.price_poller import start_price_poller, stop_price_poller
+from core.chart_render import shutdown_chart_renderer
 
 app = FastAPI()
 
+# Compress when the client accepts gzip. Streamed responses (the main page)
+# are compressed and flushed section by section. PNG charts are skipped by
+# the middleware's content-type list; level 6 keeps CPU per page low.
+app.add_middleware(GZipMiddleware, minimum_size=1000, compresslevel=6)
+
 app.include_router(backup_router)
 app.include_router(ui_router)
 app.include_router(portfolio_router)
@@ -17,8 +33,28 @@ app.include_router(tickers_router)
 app.include_router(import_export_router)
 app.include_router(charts_router)
 app.include_router(config_router)
+app.include_router(prices_router)
+app.include_router(history_router)
+app.include_router(api_router)
 
 @app.on_event("startup")
 def startup_load_backup():
     load_latest_backup_on_startup()
+    load_quote_store()
+
+
+@app.on_event("startup")
+async def startup_prices():
+    await start_price_client()
+    await start_price_poller()
+
+
+@app.on_event("shutdown")
+async def shutdown_prices():
+    await stop_price_poller()
+    await stop_price_client()
+
 
+@app.on_event("shutdown")
+def shutdown_charts():
+    shutdown_chart_renderer()
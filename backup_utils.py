@@ -1,42 +1,138 @@
+import asyncio
 import json
+import os
+from bisect import bisect_right
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Tuple
+
+import numpy as np
+
+from core.circuit_breaker import QUOTE_BREAKER, CircuitOpenError
+from core.columnar import HistorySeries, TransactionLog, now_ts, parse_time
+from core.quote_cache import QUOTE_CACHE, Quote
+from core.quote_providers import get_quote_provider
+from core.portfolio_stats import PORTFOLIO_STATS
+from core.symbol_index import SYMBOL_INDEX
+from core.timeseries import compact_after_append, downsample_history
 
 # Shared in-memory state
 PORTFOLIOS: Dict[str, Dict[str, Any]] = {}
-PORTFOLIO_HISTORY: Dict[str, List[Dict[str, Any]]] = {}
+PORTFOLIO_HISTORY: Dict[str, HistorySeries] = {}
 DEFAULT_PORTFOLIO: str = "Default"
 
+# Goes up on every change to PORTFOLIOS, TAGS or the summary order, so
+# anything rendered from them can be cached against it.
+STATE_VERSION: int = 0
+
+
+def bump_state_version() -> int:
+    global STATE_VERSION
+    STATE_VERSION += 1
+    return STATE_VERSION
+
+
+def state_version() -> int:
+    return STATE_VERSION
+
+
+def new_portfolio(tickers: Optional[List[str]] = None) -> Dict[str, Any]:
+    return {
+        "tickers": list(tickers or []),
+        "positions": {},
+        "transactions": TransactionLog(),
+    }
+
+
 # Backups directory inside container (bind-mounted on host)
 BACKUP_DIR = Path("/app/backups")
 BACKUP_DIR.mkdir(parents=True, exist_ok=True)
 
 
+# Last known quotes, kept across restarts to warm QUOTE_CACHE
+QUOTE_STORE_PATH = BACKUP_DIR / "quotes-cache.json"
+
+
 # ---------- Price fetching ----------
 
-async def fetch_prices(tickers, api_key: str) -> Dict[str, float]:
-    import httpx
+# Overall budget for one fetch_prices() call. Symbols that have not
+# answered by the deadline are left out of the result instead of holding
+# up the whole batch.
+PRICE_BATCH_DEADLINE = 12.0
+
+
+async def start_price_client() -> None:
+    """Start the configured quote provider (called on app startup)."""
+    await get_quote_provider().start()
+
 
+async def stop_price_client() -> None:
+    """Release the quote provider's connections (called on app shutdown)."""
+    await get_quote_provider().close()
+
+
+async def fetch_quotes(
+    tickers,
+    api_key: str,
+    deadline: Optional[float] = PRICE_BATCH_DEADLINE,
+    priority=(),
+) -> Dict[str, Quote]:
+    """
+    Fetch current quotes for `tickers` concurrently, serving fresh quotes
+    from QUOTE_CACHE and sharing in-flight requests between callers.
+    Symbols in `priority` get rate-limit tokens before the others.
+
+    While QUOTE_BREAKER is open, upstream is not waited on: last known
+    prices come back at once marked stale and are refreshed in the
+    background. Failed symbols without a last known price, and symbols
+    still pending after `deadline` seconds, are missing from the result.
+    """
     if not tickers:
         return {}
 
-    prices: Dict[str, float] = {}
-    async with httpx.AsyncClient(timeout=10) as client:
-        for symbol in tickers:
-            try:
-                r = await client.get(
-                    "https://finnhub.io/api/v1/quote",
-                    params={"symbol": symbol, "token": api_key},
-                )
-                r.raise_for_status()
-                data = r.json()
-                price = data.get("c")
-                if isinstance(price, (int, float)):
-                    prices[symbol] = float(price)
-            except Exception:
-                continue
-    return prices
+    quotes: Dict[str, Quote] = {}
+    priority = set(priority)
+    provider = get_quote_provider()
+
+    async def fetch_upstream(symbol: str) -> Optional[float]:
+        if not QUOTE_BREAKER.allow():
+            raise CircuitOpenError(symbol)
+        try:
+            price = await provider.fetch_quote(symbol, api_key, priority=symbol in priority)
+        except Exception:
+            QUOTE_BREAKER.record_failure()
+            raise
+        QUOTE_BREAKER.record_success()
+        return price
+
+    async def fetch_one(symbol: str) -> None:
+        try:
+            quote = await QUOTE_CACHE.get_or_fetch(
+                symbol,
+                fetch_upstream,
+                serve_stale=not QUOTE_BREAKER.is_closed,
+            )
+        except Exception:
+            return
+        if quote is not None:
+            quotes[symbol] = quote
+
+    tasks = [asyncio.ensure_future(fetch_one(sym)) for sym in dict.fromkeys(tickers)]
+    _, pending = await asyncio.wait(tasks, timeout=deadline)
+    for task in pending:
+        task.cancel()
+    return quotes
+
+
+async def fetch_prices(
+    tickers,
+    api_key: str,
+    deadline: Optional[float] = PRICE_BATCH_DEADLINE,
+    priority=(),
+) -> Dict[str, float]:
+    """fetch_quotes() reduced to plain prices (stale ones included)."""
+    quotes = await fetch_quotes(tickers, api_key, deadline=deadline, priority=priority)
+    return {sym: q.price for sym, q in quotes.items()}
 
 
 # ---------- History helpers ----------
@@ -59,59 +155,149 @@ def update_portfolio_history_point(
         price = prices.get(sym, buy)
         total_value += (price or 0.0) * qty
 
-    hist = PORTFOLIO_HISTORY.setdefault(portfolio_name, [])
-    hist.append(
-        {
-            "time": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-            "value": total_value,
-        }
+    hist = PORTFOLIO_HISTORY.get(portfolio_name)
+    if hist is None:
+        hist = PORTFOLIO_HISTORY[portfolio_name] = HistorySeries()
+    hist.append(now_ts(), total_value)
+    compact_after_append(hist)
+
+
+def history_version(portfolio_name: str) -> int:
+    """Version of the portfolio's history; 0 when it has none."""
+    hist = PORTFOLIO_HISTORY.get(portfolio_name)
+    return hist.version if hist is not None else 0
+
+
+def history_arrays(portfolio_name: str) -> Tuple[np.ndarray, np.ndarray]:
+    """Copies of the portfolio's (times, values); empty when it has none."""
+    hist = PORTFOLIO_HISTORY.get(portfolio_name)
+    return hist.as_numpy() if hist is not None else (np.empty(0), np.empty(0))
+
+
+def _transaction_delta(action: str, qty: float, price: float) -> float:
+    if action == "BUY":
+        return qty * price
+    if action == "SELL":
+        return -qty * price
+    return 0.0
+
+
+def add_transaction_to_history(portfolio_name: str, tx: Dict[str, Any]) -> None:
+    """
+    Fold one new transaction into the portfolio history without a rebuild.
+
+    A transaction at or after the last point appends one point (O(1)).
+    An older one is inserted in time order and only the points after it
+    move by its cost. With no history yet this falls back to a rebuild.
+
+    The costs column ends up as a rebuild would give it at every point.
+    The values do not: they keep the poller's market-value points, which
+    a rebuild drops, and step from whatever value precedes the transaction.
+    """
+    hist = PORTFOLIO_HISTORY.get(portfolio_name)
+    if not hist:
+        rebuild_portfolio_history_from_transactions(portfolio_name)
+        return
+
+    delta = _transaction_delta(tx.get("action"), tx.get("qty") or 0.0, tx.get("price") or 0.0)
+    ts = parse_time(tx["time"])
+    cost = None
+    if ts < hist.times[-1]:
+        # Downsampling may have dropped the points just before `ts`: take
+        # the preceding point's cost plus every logged transaction since.
+        idx = bisect_right(hist.times, ts)
+        since = hist.times[idx - 1] if idx else -np.inf
+        cost = (hist.costs[idx - 1] if idx else 0.0) + _cost_between(
+            PORTFOLIOS[portfolio_name]["transactions"], since, ts
+        )
+    hist.add_step(ts, delta, cost)
+    compact_after_append(hist)
+
+
+def _cost_between(log: TransactionLog, start: float, end: float) -> float:
+    """Net cost of the transactions in (start, end]."""
+    times, qtys, prices = log.as_numpy()
+    hits = np.flatnonzero((times > start) & (times <= end))
+    return float(sum(_transaction_delta(log.actions[i], qtys[i], prices[i]) for i in hits))
+
+
+def _running_cost(log: TransactionLog) -> Tuple[np.ndarray, np.ndarray]:
+    """(times, net cost of the transactions up to each) in time order."""
+    times, qtys, prices = log.as_numpy()
+    signs = np.fromiter(
+        (_transaction_delta(action, 1.0, 1.0) for action in log.actions),
+        dtype=np.float64,
+        count=len(log),
     )
+    order = log.time_order()
+    return times[order], np.cumsum((signs * qtys * prices)[order])
+
+
+def _costs_at(times: np.ndarray, log: TransactionLog) -> np.ndarray:
+    """Net cost of the transactions at or before each of `times`."""
+    tx_times, running_cost = _running_cost(log)
+    # 0 before the first transaction.
+    running_cost = np.concatenate(([0.0], running_cost))
+    return running_cost[np.searchsorted(tx_times, times, side="right")]
+
+
+def _fill_history_costs(hist: HistorySeries, log: TransactionLog) -> None:
+    """Recompute the costs a backup did not have (loaded as NaN)."""
+    costs = hist.costs_as_numpy()
+    missing = np.isnan(costs)
+    if not missing.any():
+        return
+    times, values = hist.as_numpy()
+    costs[missing] = _costs_at(times[missing], log)
+    hist.replace(times, values, costs)
 
 
 def rebuild_portfolio_history_from_transactions(portfolio_name: str) -> None:
     pf = PORTFOLIOS.get(portfolio_name)
     if not pf:
-        PORTFOLIO_HISTORY[portfolio_name] = []
+        PORTFOLIO_HISTORY[portfolio_name] = HistorySeries()
         return
 
-    hist: List[Dict[str, Any]] = []
-    running_cost = 0.0
-
-    for tx in sorted(pf["transactions"], key=lambda t: t["time"]):
-        qty = tx.get("qty", 0.0) or 0.0
-        price = tx.get("price", 0.0) or 0.0
-        if tx.get("action") == "BUY":
-            running_cost += qty * price
-        elif tx.get("action") == "SELL":
-            running_cost -= qty * price
-
-        hist.append(
-            {
-                "time": tx["time"],
-                "value": running_cost,
-            }
-        )
-
-    PORTFOLIO_HISTORY[portfolio_name] = hist
+    times, running_cost = _running_cost(pf["transactions"])
+    hist = HistorySeries()
+    hist.replace(times, running_cost, running_cost)
+    PORTFOLIO_HISTORY[portfolio_name] = downsample_history(hist)
 
 
 # ---------- Backup / restore ----------
 
 def _state_to_dict() -> Dict[str, Any]:
     return {
-        "PORTFOLIOS": PORTFOLIOS,
-        "PORTFOLIO_HISTORY": PORTFOLIO_HISTORY,
+        "PORTFOLIOS": {
+            name: {**pf, "transactions": pf["transactions"].to_records()}
+            for name, pf in PORTFOLIOS.items()
+        },
+        "PORTFOLIO_HISTORY": {
+            name: hist.to_records() for name, hist in PORTFOLIO_HISTORY.items()
+        },
         "DEFAULT_PORTFOLIO": DEFAULT_PORTFOLIO,
     }
 
 
 def _state_from_dict(data: Dict[str, Any]) -> None:
-    global PORTFOLIOS, PORTFOLIO_HISTORY, DEFAULT_PORTFOLIO
+    global DEFAULT_PORTFOLIO
     PORTFOLIOS.clear()
     PORTFOLIO_HISTORY.clear()
-    PORTFOLIOS.update(data.get("PORTFOLIOS", {}))
-    PORTFOLIO_HISTORY.update(data.get("PORTFOLIO_HISTORY", {}))
+    for name, pf in data.get("PORTFOLIOS", {}).items():
+        restored = new_portfolio(pf.get("tickers", []))
+        restored.update(pf)
+        restored["transactions"] = TransactionLog.from_records(pf.get("transactions", []))
+        PORTFOLIOS[name] = restored
+    empty_log = TransactionLog()
+    for name, hist in data.get("PORTFOLIO_HISTORY", {}).items():
+        series = HistorySeries.from_records(hist)
+        pf = PORTFOLIOS.get(name)
+        _fill_history_costs(series, pf["transactions"] if pf else empty_log)
+        PORTFOLIO_HISTORY[name] = downsample_history(series)
     DEFAULT_PORTFOLIO = data.get("DEFAULT_PORTFOLIO", "Default")
+    SYMBOL_INDEX.rebuild(PORTFOLIOS)
+    PORTFOLIO_STATS.rebuild(PORTFOLIOS)
+    bump_state_version()
 
 
 def create_backup_file() -> Path:
@@ -135,6 +321,27 @@ def restore_from_bytes(content: bytes) -> None:
     _state_from_dict(data)
 
 
+def save_quote_store() -> None:
+    """Write QUOTE_CACHE to QUOTE_STORE_PATH (atomically, compact JSON)."""
+    data = QUOTE_CACHE.export()
+    tmp = QUOTE_STORE_PATH.with_suffix(".tmp")
+    tmp.write_text(json.dumps(data, separators=(",", ":")))
+    os.replace(tmp, QUOTE_STORE_PATH)
+
+
+def load_quote_store() -> int:
+    """Load saved quotes into QUOTE_CACHE, keeping their original timestamps."""
+    if not QUOTE_STORE_PATH.exists():
+        return 0
+    try:
+        data = json.loads(QUOTE_STORE_PATH.read_text())
+    except Exception:
+        return 0
+    if not isinstance(data, dict):
+        return 0
+    return QUOTE_CACHE.load(data)
+
+
 def load_latest_backup_on_startup() -> None:
     path = get_latest_backup_path()
     if not path:
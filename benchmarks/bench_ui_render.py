@@ -0,0 +1,151 @@
+"""
+Main page row rendering: the table row functions (one list and one "".join)
+vs the old `rows += f"..."` loops, for 1k / 10k-row tables.
+
+    python benchmarks/bench_ui_render.py [rows ...]
+
+Run from the repository root. The "render" lines time only the HTML
+building on the same prepared rows; the "build" lines time the whole
+helper (row data, sort, render) as used by the page.
+"""
+
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.columnar import TransactionLog  # noqa: E402
+from core.history_query import query_transactions  # noqa: E402
+from routers.ui_helpers import build_history_rows, build_positions_rows  # noqa: E402
+from routers.ui_templates import history_rows, position_rows  # noqa: E402
+
+REPEAT = 20
+
+
+def legacy_history_rows(transactions, row_class):
+    rows = ""
+    for tx in transactions:
+        rows += f"""
+        <tr class="{row_class}">
+            <td>{tx["time"]}</td>
+            <td>{tx["portfolio"]}</td>
+            <td>{tx["symbol"]}</td>
+            <td>{tx["action"]}</td>
+            <td>{tx["qty"]:g}</td>
+            <td>{tx["price"]:.2f}</td>
+            <td>{tx.get("note") or ""}</td>
+        </tr>
+        """
+    return rows
+
+
+def legacy_positions_rows(rows_data):
+    rows_html = ""
+    for row in rows_data:
+        rows_html += f"""
+        <tr class="ticker-row" data-symbol="{row["symbol"]}">
+            <td><a href="https://ca.finance.yahoo.com/quote/{row["symbol"]}" target="_blank">{row["symbol"]}</a></td>
+            <td>{row["price_str"]}</td>
+            <td>{row["qty_str"]}</td>
+            <td>{row["buy_str"]}</td>
+            <td>{row["total_cost_str"]}</td>
+            <td>{row["pl_str"]}</td>
+            <td>{row["pl_pct_str"]}</td>
+            <td>{row["note"]}</td>
+            <td class="trade-cell">
+                <form method="post" class="trade-form">
+                    <input type="hidden" name="portfolio" value="{row["pname"]}">
+                    <input type="hidden" name="symbol" value="{row["symbol"]}">
+                    <input type="number" step="0.0001" name="qty" placeholder="Qty" class="trade-input qty">
+                    <input type="number" step="0.01" name="price" placeholder="Price" class="trade-input price">
+                    <input type="text" name="note" placeholder="Note" class="trade-input note">
+                    <button type="submit" formaction="/buy">Buy</button>
+                    <button type="submit" formaction="/sell">Sell</button>
+                </form>
+            </td>
+        </tr>
+        """
+    return rows_html
+
+
+def make_data(n):
+    rng = random.Random(n)
+    tickers = [f"T{i:05d}" for i in range(n)]
+    positions = {s: {"qty": rng.randint(1, 500), "buy": rng.uniform(1, 500)} for s in tickers}
+    prices = {s: rng.uniform(1, 500) for s in tickers}
+    txs = [
+        {
+            "time": f"2025-01-{1 + i % 28:02d} 10:{i % 60:02d}:00",
+            "portfolio": "Bench",
+            "symbol": tickers[i],
+            "action": "BUY",
+            "qty": float(positions[tickers[i]]["qty"]),
+            "price": positions[tickers[i]]["buy"],
+            "note": "",
+        }
+        for i in range(n)
+    ]
+    row_data = [
+        {
+            "pname": "Bench",
+            "symbol": s,
+            "price_str": f"{prices[s]:.2f}",
+            "qty_str": f"{positions[s]['qty']:g}",
+            "buy_str": f"{positions[s]['buy']:.2f}",
+            "total_cost_str": f"{positions[s]['qty'] * positions[s]['buy']:.2f}",
+            "pl_str": "0.00",
+            "pl_pct_str": "0.00",
+            "note": "",
+        }
+        for s in tickers
+    ]
+    return tickers, positions, prices, txs, row_data
+
+
+def best_of(fn):
+    best = float("inf")
+    for _ in range(REPEAT):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main(sizes):
+    print(f"{'rows':>7}  {'case':<18} {'legacy ms':>10} {'template ms':>12} {'ratio':>7}")
+    for n in sizes:
+        tickers, positions, prices, txs, row_data = make_data(n)
+        sources = [("Bench", TransactionLog.from_records(txs))]
+        cases = [
+            (
+                "render positions",
+                lambda: legacy_positions_rows(row_data),
+                lambda: position_rows(row_data),
+            ),
+            (
+                "render history",
+                lambda: legacy_history_rows(txs, "history-row"),
+                lambda: history_rows(txs, "history-row"),
+            ),
+        ]
+        for name, legacy, current in cases:
+            t_legacy = best_of(legacy)
+            t_current = best_of(current)
+            print(
+                f"{n:>7}  {name:<18} {t_legacy * 1000:>10.2f} {t_current * 1000:>12.2f} "
+                f"{t_legacy / t_current:>6.2f}x"
+            )
+        t_pos = best_of(
+            lambda: build_positions_rows("Bench", tickers, positions, {}, prices, "symbol", "asc")
+        )
+        t_hist = best_of(
+            lambda: build_history_rows(query_transactions(sources, "time", "desc"), "history-row")
+        )
+        print(f"{n:>7}  {'build positions':<18} {'':>10} {t_pos * 1000:>12.2f}")
+        print(f"{n:>7}  {'build history':<18} {'':>10} {t_hist * 1000:>12.2f}")
+
+
+if __name__ == "__main__":
+    main([int(a) for a in sys.argv[1:]] or [1000, 10000])
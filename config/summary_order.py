@@ -1,83 +1,115 @@
 import json
+import os
 from pathlib import Path
-from typing import List, Dict
+from typing import Dict, Iterable, List, Optional, Tuple
 
-from backup_utils import PORTFOLIOS
+from backup_utils import PORTFOLIOS, bump_state_version
 
 # Where to store the order on disk
 CONFIG_PATH = Path("/app/config/summary_order.json")
 
+# Parsed config and the (mtime_ns, size) of the file it came from; None
+# while the file does not exist. Re-read only when the stamp changes.
+_CONFIG_STAMP: Optional[Tuple[int, int]] = None
+_CONFIG_DATA: Dict = {}
+_CONFIG_LOADED = False
+# Bumped whenever _CONFIG_DATA is replaced, to key the merged order.
+_CONFIG_GENERATION = 0
 
-def _load_raw_config() -> Dict:
-    if not CONFIG_PATH.exists():
-        return {}
+# Merged summary order, valid for (_CONFIG_GENERATION, portfolio names).
+_ORDER: Tuple[str, ...] = ()
+_ORDER_KEY: Optional[Tuple[int, Tuple[str, ...]]] = None
+
+
+def _config_stamp() -> Optional[Tuple[int, int]]:
     try:
-        with CONFIG_PATH.open("r", encoding="utf-8") as f:
-            return json.load(f)
-    except Exception:
-        return {}
+        st = CONFIG_PATH.stat()
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
 
 
-def _save_raw_config(data: Dict) -> None:
-    CONFIG_PATH.parent.mkdir(parents=True, exist_ok=True)
-    with CONFIG_PATH.open("w", encoding="utf-8") as f:
-        json.dump(data, f, indent=2, sort_keys=True)
+def _set_config(data: Dict, stamp: Optional[Tuple[int, int]]) -> None:
+    global _CONFIG_STAMP, _CONFIG_DATA, _CONFIG_LOADED, _CONFIG_GENERATION
+    _CONFIG_DATA = data
+    _CONFIG_STAMP = stamp
+    _CONFIG_LOADED = True
+    _CONFIG_GENERATION += 1
 
 
-def get_portfolio_summary_order() -> List[str]:
+def _load_raw_config() -> Dict:
     """
-    Return the portfolio order for the summary table.
-    If config is missing or stale, fall back to current PORTFOLIOS.keys().
+    The parsed config file, cached. One stat() per call; the file is read
+    and parsed again only when its mtime or size changed (e.g. edited by
+    hand). Callers must not mutate the result.
     """
-    cfg = _load_raw_config()
-    cfg_order = cfg.get("summary_order")
+    stamp = _config_stamp()
+    if _CONFIG_LOADED and stamp == _CONFIG_STAMP:
+        return _CONFIG_DATA
+    data: Dict = {}
+    if stamp is not None:
+        try:
+            with CONFIG_PATH.open("r", encoding="utf-8") as f:
+                data = json.load(f)
+        except Exception:
+            data = {}
+        if not isinstance(data, dict):
+            data = {}
+    _set_config(data, stamp)
+    return data
 
-    current_names = list(PORTFOLIOS.keys())
 
-    if not current_names:
-        return []
+def _save_raw_config(data: Dict) -> None:
+    """Write the config atomically and keep the cache in step with it."""
+    CONFIG_PATH.parent.mkdir(parents=True, exist_ok=True)
+    tmp = CONFIG_PATH.with_suffix(".tmp")
+    with tmp.open("w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+    os.replace(tmp, CONFIG_PATH)
+    _set_config(data, _config_stamp())
+
 
-    # If no config or config not a list -> default
-    if not isinstance(cfg_order, list):
-        return current_names
+def _merge_order(order: Iterable[str]) -> Tuple[str, ...]:
+    # Existing portfolios in the given order, deduped, then any missing
+    # ones in PORTFOLIOS order; dicts keep first-insertion order.
+    merged = dict.fromkeys(name for name in order if name in PORTFOLIOS)
+    merged.update(dict.fromkeys(PORTFOLIOS))
+    return tuple(merged)
 
-    # Keep only existing portfolios, in configured order
-    seen = set()
-    ordered = []
-    for name in cfg_order:
-        if name in PORTFOLIOS and name not in seen:
-            ordered.append(name)
-            seen.add(name)
 
-    # Append any new portfolios not yet in config
-    for name in current_names:
-        if name not in seen:
-            ordered.append(name)
-            seen.add(name)
+def get_portfolio_summary_order() -> Tuple[str, ...]:
+    """
+    Return the portfolio order for the summary table.
+    If config is missing or stale, fall back to current PORTFOLIOS.keys().
 
-    return ordered
+    The merged tuple is rebuilt only when the config or the set (or
+    order) of portfolio names changed, i.e. after an add, rename or
+    remove.
+    """
+    global _ORDER, _ORDER_KEY
+    cfg = _load_raw_config()
+    key = (_CONFIG_GENERATION, tuple(PORTFOLIOS))
+    if key != _ORDER_KEY:
+        cfg_order = cfg.get("summary_order")
+        # If no config or config not a list -> default
+        _ORDER = _merge_order(cfg_order if isinstance(cfg_order, list) else ())
+        _ORDER_KEY = key
+    return _ORDER
 
 
 def set_portfolio_summary_order(order: List[str]) -> None:
     """
     Persist a new summary order.
     `order` should be a list of portfolio names in desired order.
+    Unknown names are dropped, duplicates removed and omitted portfolios
+    appended.
     """
-    # Filter against existing portfolios, dedupe
-    seen = set()
-    cleaned: List[str] = []
-    for name in order:
-        if name in PORTFOLIOS and name not in seen:
-            cleaned.append(name)
-            seen.add(name)
-
-    # Add any portfolios that were omitted
-    for name in PORTFOLIOS.keys():
-        if name not in seen:
-            cleaned.append(name)
-            seen.add(name)
-
-    data = _load_raw_config()
-    data["summary_order"] = cleaned
-    _save_raw_config(data)
+    global _ORDER, _ORDER_KEY
+    cleaned = _merge_order(order)
 
+    data = dict(_load_raw_config())
+    data["summary_order"] = list(cleaned)
+    _save_raw_config(data)
+    _ORDER = cleaned
+    _ORDER_KEY = (_CONFIG_GENERATION, tuple(PORTFOLIOS))
+    bump_state_version()
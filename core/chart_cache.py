@@ -0,0 +1,124 @@
+import asyncio
+import os
+import zlib
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Tuple, Union
+
+from fastapi import Request
+from fastapi.responses import Response
+
+# Max number of rendered charts kept; least recently used ones are evicted.
+CHART_CACHE_MAX_SIZE = 256
+
+# Random per process. History versions restart from 0 on every boot, so
+# ETags carry this too; a browser's tag from an earlier run never matches.
+_BOOT_ID = os.urandom(4).hex()
+
+
+class ChartCache:
+    """
+    Rendered chart images keyed by (kind, portfolio, history version); a
+    batch of portfolios uses their joined names and versions.
+    A new history version is a new key, so entries never go stale; old
+    versions simply age out of the LRU. Concurrent misses for the same key
+    share one render.
+    """
+
+    def __init__(self, max_size: int = CHART_CACHE_MAX_SIZE):
+        self.max_size = max_size
+        self._entries: "OrderedDict[Tuple[str, str, Union[int, str]], bytes]" = OrderedDict()
+        self._inflight: Dict[Tuple[str, str, Union[int, str]], asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    async def get_or_render(
+        self,
+        key: Tuple[str, str, Union[int, str]],
+        render: Callable[[], Awaitable[bytes]],
+    ) -> bytes:
+        body = self._entries.get(key)
+        if body is not None:
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return body
+        pending = self._inflight.get(key)
+        if pending is not None:
+            self.hits += 1
+            return await asyncio.shield(pending)
+
+        self.misses += 1
+        task = asyncio.ensure_future(self._render_and_store(key, render))
+        # Retrieve the outcome so a failure nobody awaited is not logged.
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        self._inflight[key] = task
+        return await asyncio.shield(task)
+
+    async def _render_and_store(
+        self,
+        key: Tuple[str, str, Union[int, str]],
+        render: Callable[[], Awaitable[bytes]],
+    ) -> bytes:
+        try:
+            body = await render()
+        finally:
+            self._inflight.pop(key, None)
+        self._entries[key] = body
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+        return body
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "not_modified": self.not_modified,
+            "evictions": self.evictions,
+        }
+
+
+CHART_CACHE = ChartCache()
+
+
+def _etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    tags = [t.strip() for t in header.split(",")]
+    return "*" in tags or etag in tags or f"W/{etag}" in tags
+
+
+async def cached_chart_response(
+    request: Request,
+    kind: str,
+    portfolio_name: str,
+    version: Union[int, str],
+    render: Callable[[], Awaitable[bytes]],
+    media_type: str = "image/png",
+) -> Response:
+    """
+    Serve a chart through CHART_CACHE with an ETag derived from the history
+    version and this process's boot id; a matching If-None-Match gets an
+    empty 304.
+    """
+    token = version
+    if isinstance(token, str) and len(token) > 32:
+        token = format(zlib.crc32(token.encode()), "08x")
+    etag = f'"{kind}-{_BOOT_ID}-{token}"'
+    # no-cache: browsers keep the image but revalidate, which is a cheap 304.
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if _etag_matches(request, etag):
+        CHART_CACHE.not_modified += 1
+        return Response(status_code=304, headers=headers)
+    body = await CHART_CACHE.get_or_render((kind, portfolio_name, version), render)
+    return Response(content=body, media_type=media_type, headers=headers)
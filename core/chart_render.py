@@ -0,0 +1,72 @@
+import asyncio
+import io
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional
+
+import numpy as np
+
+# Detailed PNG charts render off the event loop in this many threads. Each
+# render builds its own Figure / Agg canvas, so no pyplot global state is
+# shared. matplotlib itself is imported on the first render only; page
+# sparklines are plain SVG (core/sparkline.py) and never load it.
+CHART_RENDER_WORKERS = 4
+
+_EXECUTOR: Optional[ThreadPoolExecutor] = None
+
+
+def _executor() -> ThreadPoolExecutor:
+    global _EXECUTOR
+    if _EXECUTOR is None:
+        _EXECUTOR = ThreadPoolExecutor(
+            max_workers=CHART_RENDER_WORKERS,
+            thread_name_prefix="chart-render",
+        )
+    return _EXECUTOR
+
+
+async def run_render(render: Callable[[], bytes]) -> bytes:
+    """Run a blocking render in the bounded chart pool."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor(), render)
+
+
+def shutdown_chart_renderer() -> None:
+    global _EXECUTOR
+    if _EXECUTOR is not None:
+        _EXECUTOR.shutdown(wait=False, cancel_futures=True)
+    _EXECUTOR = None
+
+
+def _new_figure(figsize):
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    fig = Figure(figsize=figsize)
+    FigureCanvasAgg(fig)
+    return fig
+
+
+def _png_bytes(fig, **savefig_kwargs) -> bytes:
+    buf = io.BytesIO()
+    fig.savefig(buf, format="png", **savefig_kwargs)
+    return buf.getvalue()
+
+
+def render_empty_png() -> bytes:
+    fig = _new_figure((2, 1))
+    fig.add_subplot().axis("off")
+    return _png_bytes(fig, dpi=100, bbox_inches="tight", pad_inches=0)
+
+
+def render_history_png(times: np.ndarray, values: np.ndarray) -> bytes:
+    """Small filled line chart of a portfolio history, as PNG bytes."""
+    if len(times) == 0:
+        return render_empty_png()
+    fig = _new_figure((3, 1.5))
+    ax = fig.add_subplot()
+    ax.plot(times, values, color="#1976D2", linewidth=1.2)
+    ax.fill_between(times, values, color="#BBDEFB")
+    ax.set_xticks([])
+    ax.set_yticks([])
+    fig.tight_layout()
+    return _png_bytes(fig, dpi=120)
@@ -0,0 +1,81 @@
+import time
+from typing import Any, Dict
+
+# Consecutive upstream failures before the breaker opens.
+BREAKER_FAILURE_THRESHOLD = 5
+# Seconds the breaker stays open before letting one probe request through.
+BREAKER_RESET_TIMEOUT = 30.0
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    pass
+
+
+class CircuitBreaker:
+    """
+    Classic three-state breaker. While open, allow() refuses calls so they
+    fail fast; after `reset_timeout` one probe is let through (half open)
+    and its outcome closes or re-opens the breaker.
+    """
+
+    def __init__(
+        self,
+        failure_threshold: int = BREAKER_FAILURE_THRESHOLD,
+        reset_timeout: float = BREAKER_RESET_TIMEOUT,
+    ):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self._opened_at = 0.0
+        self._probe_started = 0.0
+        self.trips = 0
+        self.rejected = 0
+
+    def allow(self) -> bool:
+        if self.state == CLOSED:
+            return True
+        now = time.monotonic()
+        if self.state == OPEN and now - self._opened_at >= self.reset_timeout:
+            self.state = HALF_OPEN
+            self._probe_started = now
+            return True
+        # A probe that never reported back (e.g. cancelled) must not keep
+        # the breaker half open forever.
+        if self.state == HALF_OPEN and now - self._probe_started >= self.reset_timeout:
+            self._probe_started = now
+            return True
+        self.rejected += 1
+        return False
+
+    def record_success(self) -> None:
+        self.state = CLOSED
+        self.failures = 0
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self.state == OPEN:
+            return
+        if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+            self.state = OPEN
+            self._opened_at = time.monotonic()
+            self.trips += 1
+
+    @property
+    def is_closed(self) -> bool:
+        return self.state == CLOSED
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "failures": self.failures,
+            "trips": self.trips,
+            "rejected": self.rejected,
+        }
+
+
+QUOTE_BREAKER = CircuitBreaker()
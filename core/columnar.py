@@ -0,0 +1,268 @@
+import itertools
+import sys
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timezone
+from functools import lru_cache
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# Times are stored as float seconds of the naive wall-clock time (the
+# "%Y-%m-%d %H:%M:%S" strings read as UTC), so string <-> float round trips
+# are exact whatever the server's time zone and DST rules.
+
+
+def parse_time(value: str) -> float:
+    return datetime.fromisoformat(value).replace(tzinfo=timezone.utc).timestamp()
+
+
+@lru_cache(maxsize=65536)
+def format_time(ts: float) -> str:
+    return datetime.fromtimestamp(ts, timezone.utc).strftime(TIME_FORMAT)
+
+
+def now_ts() -> float:
+    """Current wall-clock time in the same convention, whole seconds."""
+    return float(int(datetime.now().replace(tzinfo=timezone.utc).timestamp()))
+
+
+# Source of HistorySeries.version: globally increasing, so a version names
+# one state of one series even across replaced or renamed series.
+_VERSIONS = itertools.count(1)
+
+
+def _to_numpy(arr: array) -> np.ndarray:
+    # Copy rather than view: an array.array exporting a buffer cannot grow.
+    return np.frombuffer(arr, dtype=np.float64).copy()
+
+
+def _to_array(values) -> array:
+    return array("d", np.ascontiguousarray(values, dtype=np.float64).tobytes())
+
+
+class HistorySeries:
+    """
+    One portfolio's value history as parallel typed arrays (times, values,
+    costs), kept in time order. Converts to and from the
+    `[{"time": str, "value": float, "cost": float}]` shape used in JSON
+    backups. `version` changes on every mutation (cache key for rendered
+    charts). `appended` counts points added since the last compaction.
+
+    `values` is what the charts plot and mixes two meanings: the poller's
+    market-value points, and steps of a transaction's cost on top of the
+    value just before it. `costs` is the running net cost of the
+    transactions up to each point (buys minus sells), whatever kind of
+    point it is; it always equals what a rebuild from the transactions
+    gives at that time.
+    """
+
+    __slots__ = ("times", "values", "costs", "version", "appended")
+
+    def __init__(self, times: Iterable[float] = (), values: Iterable[float] = (), costs: Iterable[float] = ()):
+        self.times = array("d", times)
+        self.values = array("d", values)
+        self.costs = array("d", costs)
+        self.version = next(_VERSIONS)
+        self.appended = 0
+
+    def __len__(self) -> int:
+        return len(self.times)
+
+    def __bool__(self) -> bool:
+        return len(self.times) > 0
+
+    def append(self, ts: float, value: float, cost: Optional[float] = None) -> None:
+        """Add a point at the end; `cost` defaults to the last point's."""
+        if cost is None:
+            cost = self.costs[-1] if self.costs else 0.0
+        self.times.append(ts)
+        self.values.append(value)
+        self.costs.append(cost)
+        self.version = next(_VERSIONS)
+
+    def add_step(self, ts: float, delta: float, cost: Optional[float] = None) -> None:
+        """
+        Add a transaction costing `delta` at `ts`: a new point worth the
+        value just before `ts` plus `delta`, and every later point's value
+        and cost moved by `delta`. The new point's cost defaults to the
+        previous point's plus `delta`; pass `cost` when points before `ts`
+        may be missing. O(1) when `ts` is not older than the last point.
+        """
+        if not self.times or self.times[-1] <= ts:
+            value = self.values[-1] if self.values else 0.0
+            if cost is None:
+                cost = (self.costs[-1] if self.costs else 0.0) + delta
+            self.append(ts, value + delta, cost)
+            return
+        idx = bisect_right(self.times, ts)
+        base_value = self.values[idx - 1] if idx else 0.0
+        if cost is None:
+            cost = (self.costs[idx - 1] if idx else 0.0) + delta
+        times, values = self.as_numpy()
+        costs = self.costs_as_numpy()
+        values[idx:] += delta
+        costs[idx:] += delta
+        self.replace(
+            np.insert(times, idx, ts),
+            np.insert(values, idx, base_value + delta),
+            np.insert(costs, idx, cost),
+        )
+
+    def replace(self, times: np.ndarray, values: np.ndarray, costs: np.ndarray) -> None:
+        self.times = _to_array(times)
+        self.values = _to_array(values)
+        self.costs = _to_array(costs)
+        self.version = next(_VERSIONS)
+
+    def as_numpy(self) -> Tuple[np.ndarray, np.ndarray]:
+        """float64 copies of (times, values); a bulk memcpy, safe to keep."""
+        return _to_numpy(self.times), _to_numpy(self.values)
+
+    def costs_as_numpy(self) -> np.ndarray:
+        """float64 copy of the costs column."""
+        return _to_numpy(self.costs)
+
+    def range(self, start: Optional[float] = None, end: Optional[float] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """(times, values) views for start <= time <= end."""
+        lo = 0 if start is None else bisect_left(self.times, start)
+        hi = len(self.times) if end is None else bisect_right(self.times, end)
+        times, values = self.as_numpy()
+        return times[lo:hi], values[lo:hi]
+
+    def to_records(self) -> List[Dict[str, Any]]:
+        return [
+            {"time": format_time(t), "value": v, "cost": c}
+            for t, v, c in zip(self.times, self.values, self.costs)
+        ]
+
+    @classmethod
+    def from_records(cls, records: Iterable[Dict[str, Any]]) -> "HistorySeries":
+        """Backups from before the costs column load with NaN costs."""
+        points = []
+        for rec in records:
+            try:
+                points.append((parse_time(rec["time"]), float(rec["value"]), float(rec.get("cost", "nan"))))
+            except (KeyError, TypeError, ValueError):
+                continue
+        points.sort(key=lambda p: p[0])
+        return cls((p[0] for p in points), (p[1] for p in points), (p[2] for p in points))
+
+
+def _intern(value: Any) -> str:
+    return sys.intern(str(value)) if value is not None else ""
+
+
+class TransactionLog:
+    """
+    A portfolio's transactions stored column-wise: times, quantities and
+    prices in typed arrays, symbols / actions / portfolio names / notes as
+    interned strings. Behaves like a list of transaction dicts for reading
+    (iteration, indexing, len) and for append / extend.
+
+    Rows are kept in time order (ties in insertion order): appending the
+    newest transaction is O(1), an older one is inserted in place.
+    `version` changes on every mutation (cache key for sorted indexes).
+    """
+
+    __slots__ = ("times", "qtys", "prices", "symbols", "actions", "portfolios", "notes", "version")
+
+    def __init__(self):
+        self.times = array("d")
+        self.qtys = array("d")
+        self.prices = array("d")
+        self.symbols: List[str] = []
+        self.actions: List[str] = []
+        self.portfolios: List[str] = []
+        self.notes: List[str] = []
+        self.version = next(_VERSIONS)
+
+    def __len__(self) -> int:
+        return len(self.times)
+
+    def __bool__(self) -> bool:
+        return len(self.times) > 0
+
+    @staticmethod
+    def _parse(tx: Dict[str, Any]) -> Tuple[float, float, float, str, str, str, str]:
+        time_value = tx.get("time")
+        ts = time_value if isinstance(time_value, (int, float)) else parse_time(time_value)
+        return (
+            ts,
+            float(tx.get("qty") or 0.0),
+            float(tx.get("price") or 0.0),
+            _intern(tx.get("symbol")),
+            _intern(tx.get("action")),
+            _intern(tx.get("portfolio")),
+            _intern(tx.get("note")),
+        )
+
+    def _columns(self) -> Tuple[Any, ...]:
+        return (self.times, self.qtys, self.prices, self.symbols, self.actions, self.portfolios, self.notes)
+
+    def append(self, tx: Dict[str, Any]) -> None:
+        row = self._parse(tx)
+        ts = row[0]
+        if not self.times or self.times[-1] <= ts:
+            for column, value in zip(self._columns(), row):
+                column.append(value)
+        else:
+            idx = bisect_right(self.times, ts)
+            for column, value in zip(self._columns(), row):
+                column.insert(idx, value)
+        self.version = next(_VERSIONS)
+
+    def extend(self, txs: Iterable[Dict[str, Any]]) -> None:
+        for tx in txs:
+            self.append(tx)
+
+    def record(self, i: int) -> Dict[str, Any]:
+        return {
+            "time": format_time(self.times[i]),
+            "portfolio": self.portfolios[i],
+            "symbol": self.symbols[i],
+            "action": self.actions[i],
+            "qty": self.qtys[i],
+            "price": self.prices[i],
+            "note": self.notes[i],
+        }
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self.record(j) for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("transaction index out of range")
+        return self.record(i)
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        for i in range(len(self)):
+            yield self.record(i)
+
+    def as_numpy(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """float64 copies of the (times, qtys, prices) columns."""
+        return _to_numpy(self.times), _to_numpy(self.qtys), _to_numpy(self.prices)
+
+    def time_order(self) -> np.ndarray:
+        """Indices that visit the transactions by time; rows already are in time order."""
+        return np.arange(len(self))
+
+    def to_records(self) -> List[Dict[str, Any]]:
+        return list(self)
+
+    @classmethod
+    def from_records(cls, records: Iterable[Dict[str, Any]]) -> "TransactionLog":
+        rows = []
+        for rec in records:
+            try:
+                rows.append(cls._parse(rec))
+            except (KeyError, TypeError, ValueError):
+                continue
+        rows.sort(key=lambda row: row[0])
+        log = cls()
+        for column, values in zip(log._columns(), zip(*rows)):
+            column.extend(values)
+        return log
@@ -0,0 +1,79 @@
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Tuple, TypeVar
+
+T = TypeVar("T")
+
+# Max number of rendered page fragments kept; least recently used ones are evicted.
+FRAGMENT_CACHE_MAX_SIZE = 512
+
+# prices_version for fragments that do not read prices at all.
+NO_PRICES = 0
+
+
+class FragmentCache:
+    """
+    Rendered page fragments keyed by (name, params, state version, price
+    snapshot version).
+
+    The state version changes on every mutation of the portfolios, so an
+    entry is never served after the data it was built from changed. When a
+    newer state version shows up every older entry is dropped at once; old
+    price versions simply age out of the LRU. Fragments that do not depend
+    on prices pass NO_PRICES and survive price refreshes.
+    """
+
+    def __init__(self, max_size: int = FRAGMENT_CACHE_MAX_SIZE):
+        self.max_size = max_size
+        self._entries: "OrderedDict[Tuple[str, Hashable, int], Any]" = OrderedDict()
+        self._state_version = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get_or_build(
+        self,
+        name: str,
+        params: Hashable,
+        state_version: int,
+        prices_version: int,
+        build: Callable[[], T],
+    ) -> T:
+        if state_version != self._state_version:
+            self._entries.clear()
+            self._state_version = state_version
+        key = (name, params, prices_version)
+        try:
+            value = self._entries[key]
+        except KeyError:
+            pass
+        else:
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return value
+
+        self.misses += 1
+        value = build()
+        self._entries[key] = value
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+        return value
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "state_version": self._state_version,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+FRAGMENT_CACHE = FragmentCache()
@@ -0,0 +1,182 @@
+import base64
+import heapq
+import json
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from itertools import islice
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from core.columnar import TransactionLog, format_time
+
+# Rows per page of the history tables.
+HISTORY_PAGE_SIZE = 100
+HISTORY_PAGE_MAX = 1000
+
+HISTORY_SORT_COLUMNS = ("time", "portfolio", "symbol", "action", "qty", "price")
+
+# (owner portfolio, log) pairs: the per-portfolio table passes one, the
+# global table every portfolio's.
+Sources = Sequence[Tuple[str, TransactionLog]]
+
+
+class HistoryPage:
+    """One page of transactions plus what the UI needs to link onwards."""
+
+    __slots__ = ("rows", "next_cursor", "total", "matched")
+
+    def __init__(self, rows: List[Dict[str, Any]], next_cursor: Optional[str], total: int, matched: int):
+        self.rows = rows
+        self.next_cursor = next_cursor
+        self.total = total
+        self.matched = matched
+
+
+def encode_cursor(sort_by: str, key: Tuple) -> str:
+    raw = json.dumps([sort_by, *key], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str], sort_by: str) -> Optional[Tuple]:
+    """
+    The sort key a cursor points after; None when missing, malformed or
+    made for another sort column.
+    """
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        data = json.loads(raw)
+    except (ValueError, TypeError):
+        return None
+    if not isinstance(data, list) or len(data) != 5 or data[0] != sort_by:
+        return None
+    key = tuple(data[1:])
+    value_ok = _is_number(key[0]) if sort_by in ("time", "qty", "price") else isinstance(key[0], str)
+    if not value_ok or not _is_number(key[1]):
+        return None
+    if not isinstance(key[2], str) or not isinstance(key[3], int) or isinstance(key[3], bool):
+        return None
+    return key
+
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _row_text(log: TransactionLog, i: int) -> str:
+    # Same text the table row shows, for "any text in row" filtering.
+    return (
+        f"{format_time(log.times[i])} {log.portfolios[i]} {log.symbols[i]} {log.actions[i]} "
+        f"{log.qtys[i]:g} {log.prices[i]:.2f} {log.notes[i]}"
+    ).upper()
+
+
+def _column(log: TransactionLog, sort_by: str):
+    if sort_by == "portfolio":
+        return log.portfolios
+    if sort_by == "symbol":
+        return log.symbols
+    if sort_by == "action":
+        return log.actions
+    if sort_by == "qty":
+        return log.qtys
+    if sort_by == "price":
+        return log.prices
+    return log.times
+
+
+# Sorted (and filtered) row indexes per log state, keyed by
+# (log.version, sort_by, query). Versions are global, so a key never
+# outlives the transactions it was built from; old ones age out.
+HISTORY_INDEX_CACHE_SIZE = 64
+_INDEX_CACHE: "OrderedDict[Tuple[int, str, str], Sequence[int]]" = OrderedDict()
+
+
+def _sorted_index(log: TransactionLog, sort_by: str, needle: str) -> Sequence[int]:
+    """
+    Row indexes of `log` matching `needle`, ordered by (column, time,
+    index). Logs are kept in time order, so the unfiltered time order is
+    just range(len(log)).
+    """
+    if sort_by == "time" and not needle:
+        return range(len(log))
+    key = (log.version, sort_by, needle)
+    order = _INDEX_CACHE.get(key)
+    if order is not None:
+        _INDEX_CACHE.move_to_end(key)
+        return order
+
+    if needle:
+        order = [i for i in _sorted_index(log, "time", "") if needle in _row_text(log, i)]
+    else:
+        order = range(len(log))
+    if sort_by != "time":
+        column = _column(log, sort_by)
+        # Stable sort of time-ordered rows: ties stay by (time, index).
+        order = sorted(order, key=column.__getitem__)
+    _INDEX_CACHE[key] = order
+    while len(_INDEX_CACHE) > HISTORY_INDEX_CACHE_SIZE:
+        _INDEX_CACHE.popitem(last=False)
+    return order
+
+
+def _keyed(log: TransactionLog, owner: str, sort_by: str) -> Callable[[int], Tuple]:
+    column = _column(log, sort_by)
+    times = log.times
+    return lambda i: (column[i], times[i], owner, i)
+
+
+def query_transactions(
+    sources: Sources,
+    sort_by: str = "time",
+    sort_dir: str = "desc",
+    query: str = "",
+    cursor: Optional[str] = None,
+    limit: int = HISTORY_PAGE_SIZE,
+) -> HistoryPage:
+    """
+    Filter, sort and page transactions on the server.
+
+    `query` keeps rows whose text contains it (case-insensitive), like the
+    old client-side "any text in row" filter. Rows are ordered by (column, time, owner,
+    index in owner's log), a total order that new transactions do not
+    disturb, so a cursor (the key of the last row shown) stays valid while
+    they arrive.
+
+    Each source contributes its cached sorted index, entered at the cursor
+    by bisection; a lazy k-way heap merge of the sources stops as soon as
+    the page (plus one row, to know whether there is a next page) is full.
+    """
+    if sort_by not in HISTORY_SORT_COLUMNS:
+        sort_by = "time"
+    if sort_dir not in ("asc", "desc"):
+        sort_dir = "desc"
+    limit = max(1, min(int(limit), HISTORY_PAGE_MAX))
+    needle = (query or "").strip().upper()
+    after = decode_cursor(cursor, sort_by)
+    descending = sort_dir == "desc"
+
+    streams = []
+    total = 0
+    matched = 0
+    for owner, log in sources:
+        total += len(log)
+        order = _sorted_index(log, sort_by, needle)
+        matched += len(order)
+        key = _keyed(log, owner, sort_by)
+        if descending:
+            end = bisect_left(order, after, key=key) if after is not None else len(order)
+            positions = range(end - 1, -1, -1)
+        else:
+            start = bisect_right(order, after, key=key) if after is not None else 0
+            positions = range(start, len(order))
+        streams.append(map(key, map(order.__getitem__, positions)))
+
+    page = list(islice(heapq.merge(*streams, reverse=descending), limit + 1))
+    more = len(page) > limit
+    del page[limit:]
+
+    logs = dict(sources)
+    rows = [logs[owner].record(i) for _, _, owner, i in page]
+    next_cursor = encode_cursor(sort_by, page[-1]) if page and more else None
+    return HistoryPage(rows, next_cursor, total, matched)
@@ -0,0 +1,100 @@
+from typing import Any, Dict, Mapping, Optional, Tuple
+
+from core.columnar import parse_time
+
+
+class PortfolioStats:
+    """
+    Running aggregates of one portfolio: the latest note per symbol and
+    the (qty, cost basis) of every listed symbol with a position, with
+    their total. Kept up to date per transaction, so readers never scan
+    the transaction log.
+    """
+
+    __slots__ = ("latest_notes", "_note_times", "holdings", "total_cost")
+
+    def __init__(self):
+        self.latest_notes: Dict[str, str] = {}
+        self._note_times: Dict[str, float] = {}
+        self.holdings: Dict[str, Tuple[float, float]] = {}
+        self.total_cost = 0.0
+
+    @property
+    def position_count(self) -> int:
+        return len(self.holdings)
+
+    def note(self, ts: float, symbol: str, note: str) -> None:
+        # Same rule as reading the time-ordered log to the end: the latest
+        # note wins, and a tie goes to the transaction added last.
+        if symbol and note and ts >= self._note_times.get(symbol, float("-inf")):
+            self.latest_notes[symbol] = note
+            self._note_times[symbol] = ts
+
+    def update(self, pf: Mapping[str, Any], symbol: str) -> None:
+        old = self.holdings.pop(symbol, None)
+        if old is not None:
+            self.total_cost -= old[1]
+        pos = pf["positions"].get(symbol)
+        if pos and symbol in pf["tickers"]:
+            qty = pos.get("qty")
+            buy = pos.get("buy")
+            if qty is not None and buy is not None:
+                cost = qty * buy
+                self.holdings[symbol] = (qty, cost)
+                self.total_cost += cost
+        if not self.holdings:
+            # Nothing left: drop any rounding residue of the running sum.
+            self.total_cost = 0.0
+
+    @classmethod
+    def from_portfolio(cls, pf: Mapping[str, Any]) -> "PortfolioStats":
+        stats = cls()
+        log = pf["transactions"]
+        for ts, symbol, note in zip(log.times, log.symbols, log.notes):
+            stats.note(ts, symbol, note)
+        for symbol in pf["tickers"]:
+            stats.update(pf, symbol)
+        return stats
+
+
+class PortfolioStatsRegistry:
+    """PortfolioStats per portfolio name, maintained by the mutating routes."""
+
+    def __init__(self):
+        self._stats: Dict[str, PortfolioStats] = {}
+
+    def get(self, name: str, pf: Mapping[str, Any]) -> PortfolioStats:
+        stats = self._stats.get(name)
+        if stats is None:
+            stats = self._stats[name] = PortfolioStats.from_portfolio(pf)
+        return stats
+
+    def update(self, name: str, pf: Mapping[str, Any], symbol: str) -> None:
+        """Re-read one symbol's position, O(1)."""
+        self.get(name, pf).update(pf, symbol)
+
+    def add_transaction(self, name: str, pf: Mapping[str, Any], tx: Mapping[str, Any]) -> None:
+        """Fold one new transaction's note in, O(1)."""
+        self.get(name, pf).note(parse_time(tx["time"]), tx.get("symbol") or "", tx.get("note") or "")
+
+    def reindex(self, name: str, pf: Optional[Mapping[str, Any]] = None) -> None:
+        """Recompute a whole portfolio, e.g. after an import."""
+        self._stats.pop(name, None)
+        if pf is not None:
+            self.get(name, pf)
+
+    def drop(self, name: str) -> None:
+        self._stats.pop(name, None)
+
+    def rename(self, old: str, new: str) -> None:
+        stats = self._stats.pop(old, None)
+        if stats is not None:
+            self._stats[new] = stats
+
+    def rebuild(self, portfolios: Mapping[str, Mapping[str, Any]]) -> None:
+        self._stats.clear()
+        for name, pf in portfolios.items():
+            self.get(name, pf)
+
+
+PORTFOLIO_STATS = PortfolioStatsRegistry()
@@ -0,0 +1,153 @@
+import asyncio
+import time
+from typing import Dict, FrozenSet, Optional
+
+from backup_utils import (
+    PORTFOLIOS,
+    fetch_quotes,
+    save_quote_store,
+    update_portfolio_history_point,
+)
+from core.quote_cache import QUOTE_CACHE
+from core.state import FINNHUB_API_KEY
+
+# Seconds between two background refreshes of every symbol in PORTFOLIOS.
+PRICE_POLL_INTERVAL = 60.0
+
+
+class PriceSnapshot:
+    """
+    Immutable result of one poll: prices, the symbols that were asked for,
+    and which of the prices are stale last known values.
+    """
+
+    __slots__ = ("prices", "stale", "symbols", "version", "updated_at")
+
+    def __init__(
+        self,
+        prices: Dict[str, float],
+        stale: FrozenSet[str],
+        symbols: FrozenSet[str],
+        version: int,
+        updated_at: float,
+    ):
+        self.prices = prices
+        self.stale = stale
+        self.symbols = symbols
+        self.version = version
+        self.updated_at = updated_at
+
+
+_SNAPSHOT = PriceSnapshot({}, frozenset(), frozenset(), 0, 0.0)
+_POLL_TASK: Optional[asyncio.Task] = None
+_WAKEUP: Optional[asyncio.Event] = None
+# Portfolio last shown in the UI; its symbols get rate-limit priority.
+_ACTIVE_PORTFOLIO: Optional[str] = None
+
+
+def get_price_snapshot() -> PriceSnapshot:
+    return _SNAPSHOT
+
+
+def request_price_refresh() -> None:
+    """Ask the poller to run now instead of waiting for the next interval."""
+    if _WAKEUP is not None:
+        _WAKEUP.set()
+
+
+def note_active_portfolio(name: str) -> None:
+    global _ACTIVE_PORTFOLIO
+    _ACTIVE_PORTFOLIO = name
+
+
+def _all_symbols() -> FrozenSet[str]:
+    symbols = set()
+    for pf in PORTFOLIOS.values():
+        symbols.update(pf["tickers"])
+    return frozenset(symbols)
+
+
+async def refresh_prices() -> PriceSnapshot:
+    """Fetch every symbol once, publish a new snapshot and record history."""
+    global _SNAPSHOT
+    symbols = _all_symbols()
+    active = PORTFOLIOS.get(_ACTIVE_PORTFOLIO) if _ACTIVE_PORTFOLIO else None
+    priority = active["tickers"] if active else ()
+    # Least recently quoted first, so symbols that lost out to the rate
+    # limit on the previous run are not starved again.
+    ordered = sorted(symbols, key=lambda sym: QUOTE_CACHE.fetched_at(sym) or 0.0)
+    quotes = await fetch_quotes(
+        ordered,
+        FINNHUB_API_KEY,
+        deadline=PRICE_POLL_INTERVAL,
+        priority=priority,
+    )
+    prices = {sym: q.price for sym, q in quotes.items()}
+    stale = frozenset(sym for sym, q in quotes.items() if q.stale)
+    _SNAPSHOT = PriceSnapshot(prices, stale, symbols, _SNAPSHOT.version + 1, time.time())
+
+    if len(stale) < len(quotes):
+        _save_quotes()
+
+    for pfname, pf in list(PORTFOLIOS.items()):
+        update_portfolio_history_point(pfname, pf["tickers"], pf["positions"], prices)
+    return _SNAPSHOT
+
+
+def _save_quotes() -> None:
+    try:
+        save_quote_store()
+    except OSError:
+        pass
+
+
+def _seed_snapshot() -> None:
+    """Publish whatever the quote cache already knows (e.g. from disk)."""
+    global _SNAPSHOT
+    prices: Dict[str, float] = {}
+    stale = set()
+    for sym in _all_symbols():
+        quote = QUOTE_CACHE.peek(sym)
+        if quote is None:
+            continue
+        prices[sym] = quote.price
+        if quote.stale:
+            stale.add(sym)
+    if prices:
+        _SNAPSHOT = PriceSnapshot(
+            prices, frozenset(stale), frozenset(prices), _SNAPSHOT.version + 1, time.time()
+        )
+
+
+async def _poll_loop() -> None:
+    while True:
+        _WAKEUP.clear()
+        try:
+            await refresh_prices()
+        except Exception:
+            pass
+        try:
+            await asyncio.wait_for(_WAKEUP.wait(), timeout=PRICE_POLL_INTERVAL)
+        except asyncio.TimeoutError:
+            pass
+
+
+async def start_price_poller() -> None:
+    global _POLL_TASK, _WAKEUP
+    if _POLL_TASK is None:
+        _seed_snapshot()
+        _WAKEUP = asyncio.Event()
+        _POLL_TASK = asyncio.create_task(_poll_loop())
+
+
+async def stop_price_poller() -> None:
+    global _POLL_TASK, _WAKEUP
+    if _POLL_TASK is not None:
+        _POLL_TASK.cancel()
+        try:
+            await _POLL_TASK
+        except asyncio.CancelledError:
+            pass
+        _save_quotes()
+    _POLL_TASK = None
+    _WAKEUP = None
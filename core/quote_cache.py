@@ -0,0 +1,171 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+# How long a fetched quote is served without asking upstream again.
+QUOTE_CACHE_TTL = 60.0
+# Max number of symbols kept; least recently used ones are evicted first.
+QUOTE_CACHE_MAX_SIZE = 1000
+
+
+class Quote(NamedTuple):
+    price: float
+    fetched_at: float
+    # True when this is a last known price served past its TTL.
+    stale: bool = False
+
+
+class QuoteCache:
+    """
+    In-process quote cache keyed by symbol.
+
+    Entries expire after `ttl` seconds and the cache holds at most `max_size`
+    symbols (LRU eviction). Concurrent misses for the same symbol share a
+    single in-flight fetch. Expired entries are kept as last known prices
+    and served, marked stale, when upstream cannot give a fresh one.
+    """
+
+    def __init__(self, ttl: float = QUOTE_CACHE_TTL, max_size: int = QUOTE_CACHE_MAX_SIZE):
+        self.ttl = ttl
+        self.max_size = max_size
+        # symbol -> (price, fetched_at)
+        self._entries: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.upstream_calls = 0
+        self.evictions = 0
+        self.stale_served = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, symbol: str) -> Optional[float]:
+        """Return the cached price if it is still fresh, without counting."""
+        entry = self._entries.get(symbol)
+        if entry is None or time.time() - entry[1] > self.ttl:
+            return None
+        return entry[0]
+
+    def peek(self, symbol: str) -> Optional[Quote]:
+        """Return the entry, fresh or stale, without counting or fetching."""
+        entry = self._entries.get(symbol)
+        if entry is None:
+            return None
+        return Quote(entry[0], entry[1], stale=time.time() - entry[1] > self.ttl)
+
+    def fetched_at(self, symbol: str) -> Optional[float]:
+        entry = self._entries.get(symbol)
+        return entry[1] if entry is not None else None
+
+    def put(self, symbol: str, price: float, fetched_at: Optional[float] = None) -> None:
+        self._entries[symbol] = (price, time.time() if fetched_at is None else fetched_at)
+        self._entries.move_to_end(symbol)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    async def get_or_fetch(
+        self,
+        symbol: str,
+        fetch: Callable[[str], Awaitable[Optional[float]]],
+        serve_stale: bool = False,
+    ) -> Optional[Quote]:
+        """
+        Return a quote for `symbol`, calling `fetch(symbol)` on a miss.
+
+        The fetch runs as its own task, so a caller giving up (deadline,
+        disconnect) does not cancel it for the other waiters. With
+        `serve_stale`, an expired entry is returned at once and the fetch
+        only refreshes it in the background. If the fetch fails, the last
+        known price is returned as stale; without one the error propagates.
+        """
+        entry = self._entries.get(symbol)
+        if entry is not None and time.time() - entry[1] <= self.ttl:
+            self.hits += 1
+            self._entries.move_to_end(symbol)
+            return Quote(entry[0], entry[1])
+
+        self.misses += 1
+        task = self._inflight.get(symbol)
+        if task is None:
+            self.upstream_calls += 1
+            task = asyncio.ensure_future(self._fetch_and_store(symbol, fetch))
+            # Retrieve the outcome so a failure nobody awaited is not logged.
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())
+            self._inflight[symbol] = task
+        else:
+            self.coalesced += 1
+
+        if serve_stale and entry is not None:
+            self.stale_served += 1
+            return Quote(entry[0], entry[1], stale=True)
+
+        try:
+            return await asyncio.shield(task)
+        except Exception:
+            if entry is None:
+                raise
+            self.stale_served += 1
+            return Quote(entry[0], entry[1], stale=True)
+
+    async def _fetch_and_store(
+        self,
+        symbol: str,
+        fetch: Callable[[str], Awaitable[Optional[float]]],
+    ) -> Optional[Quote]:
+        try:
+            price = await fetch(symbol)
+            if price is None:
+                return None
+            quote = Quote(price, time.time())
+            self.put(symbol, quote.price, quote.fetched_at)
+            return quote
+        finally:
+            self._inflight.pop(symbol, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def export(self) -> Dict[str, List[float]]:
+        """All entries as {symbol: [price, fetched_at]}, oldest use first."""
+        return {sym: [price, ts] for sym, (price, ts) in self._entries.items()}
+
+    def load(self, data: Dict[str, Any]) -> int:
+        """
+        Merge entries in the export() shape, keeping whichever side is newer.
+        Malformed items are skipped. Returns the number of entries taken.
+        """
+        loaded = 0
+        for sym, item in data.items():
+            try:
+                price, ts = float(item[0]), float(item[1])
+            except (TypeError, ValueError, IndexError):
+                continue
+            current = self._entries.get(sym)
+            if current is not None and current[1] >= ts:
+                continue
+            self.put(sym, price, ts)
+            loaded += 1
+        return loaded
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "upstream_calls": self.upstream_calls,
+            "evictions": self.evictions,
+            "stale_served": self.stale_served,
+            "hit_ratio": (self.hits / lookups) if lookups else 0.0,
+            "saved_upstream_calls": lookups - self.upstream_calls,
+        }
+
+
+QUOTE_CACHE = QuoteCache()
@@ -0,0 +1,362 @@
+import asyncio
+import json
+import os
+import random
+import time
+import zlib
+from abc import ABC, abstractmethod
+from datetime import datetime
+from email.utils import parsedate_to_datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from core.rate_limit import TokenBucket
+
+# Which provider fetch_prices() uses: "finnhub", "synthetic" or "replay".
+QUOTE_PROVIDER = os.environ.get("QUOTE_PROVIDER", "finnhub")
+
+# Synthetic provider: mean latency per quote (seconds), share of failed
+# quotes, and the seed that makes every run produce the same prices.
+SYNTHETIC_LATENCY = float(os.environ.get("QUOTE_SYNTHETIC_LATENCY", "0.05"))
+SYNTHETIC_ERROR_RATE = float(os.environ.get("QUOTE_SYNTHETIC_ERROR_RATE", "0.0"))
+SYNTHETIC_SEED = int(os.environ.get("QUOTE_SYNTHETIC_SEED", "0"))
+
+# Replay provider: JSON lines file of {"symbol", "price", "time"} records,
+# and an optional fixed latency per quote.
+QUOTE_REPLAY_PATH = Path(os.environ.get("QUOTE_REPLAY_PATH", "/app/backups/quotes-replay.jsonl"))
+QUOTE_REPLAY_LATENCY = float(os.environ.get("QUOTE_REPLAY_LATENCY", "0"))
+
+# When set, every quote fetched from a live provider is appended to this
+# file in the replay format.
+QUOTE_RECORD_PATH = os.environ.get("QUOTE_RECORD_PATH", "")
+
+# Recorded quotes are buffered and written off the event loop once this
+# many are pending or the oldest has waited this long, and on close.
+QUOTE_RECORD_FLUSH_EVERY = 64
+QUOTE_RECORD_FLUSH_SECONDS = 5.0
+
+FINNHUB_QUOTE_URL = "https://finnhub.io/api/v1/quote"
+
+# Timeout for a single quote request.
+PRICE_REQUEST_TIMEOUT = 10.0
+
+# Max number of quote requests in flight at once, shared by all callers.
+PRICE_FETCH_CONCURRENCY = 8
+
+# Finnhub free tier: ~60 calls/minute. The bucket refills at
+# (limit - burst) per minute so no 60 s window can exceed the limit.
+FINNHUB_CALLS_PER_MINUTE = 60
+FINNHUB_BURST = 10
+FINNHUB_RATE_LIMIT = TokenBucket(
+    rate=(FINNHUB_CALLS_PER_MINUTE - FINNHUB_BURST) / 60.0,
+    capacity=FINNHUB_BURST,
+)
+
+# Retries for 429 / 5xx answers, with exponential backoff unless the
+# response carries a Retry-After header.
+PRICE_MAX_RETRIES = 3
+PRICE_BACKOFF_BASE = 1.0
+PRICE_BACKOFF_MAX = 30.0
+
+
+class QuoteError(Exception):
+    pass
+
+
+class QuoteProvider(ABC):
+    """
+    Source of current prices. fetch_quote() returns the price, None when the
+    symbol has no quote, or raises on failure.
+    """
+
+    name = "base"
+
+    async def start(self) -> None:
+        pass
+
+    async def close(self) -> None:
+        pass
+
+    @abstractmethod
+    async def fetch_quote(self, symbol: str, api_key: str, priority: bool = False) -> Optional[float]:
+        ...
+
+    def stats(self) -> Dict[str, Any]:
+        return {"name": self.name}
+
+
+def _retry_after_seconds(response) -> Optional[float]:
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max((when - datetime.now(when.tzinfo)).total_seconds(), 0.0)
+
+
+class FinnhubProvider(QuoteProvider):
+    """Live quotes from finnhub.io over one pooled, rate-limited client."""
+
+    name = "finnhub"
+
+    def __init__(self):
+        self._client = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    async def start(self) -> None:
+        import httpx
+
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=PRICE_REQUEST_TIMEOUT,
+                limits=httpx.Limits(
+                    max_connections=PRICE_FETCH_CONCURRENCY,
+                    max_keepalive_connections=PRICE_FETCH_CONCURRENCY,
+                ),
+            )
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(PRICE_FETCH_CONCURRENCY)
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+        self._client = None
+        self._semaphore = None
+
+    async def fetch_quote(self, symbol: str, api_key: str, priority: bool = False) -> Optional[float]:
+        if self._client is None:
+            await self.start()
+
+        for attempt in range(PRICE_MAX_RETRIES + 1):
+            await FINNHUB_RATE_LIMIT.acquire(priority=priority)
+            async with self._semaphore:
+                r = await self._client.get(
+                    FINNHUB_QUOTE_URL,
+                    params={"symbol": symbol, "token": api_key},
+                )
+            retryable = r.status_code == 429 or r.status_code >= 500
+            if not retryable or attempt == PRICE_MAX_RETRIES:
+                break
+            delay = _retry_after_seconds(r)
+            if delay is None:
+                delay = PRICE_BACKOFF_BASE * (2 ** attempt) * random.uniform(1.0, 1.5)
+            delay = min(delay, PRICE_BACKOFF_MAX)
+            if r.status_code == 429:
+                # Throttled: hold back every caller, not just this symbol.
+                FINNHUB_RATE_LIMIT.pause(delay)
+            else:
+                await asyncio.sleep(delay)
+
+        r.raise_for_status()
+        price = r.json().get("c")
+        if isinstance(price, (int, float)):
+            return float(price)
+        return None
+
+    def stats(self) -> Dict[str, Any]:
+        return {"name": self.name, "rate_limit": FINNHUB_RATE_LIMIT.stats()}
+
+
+class SyntheticProvider(QuoteProvider):
+    """
+    Offline random-walk quotes. Each symbol has its own seeded generator, so
+    the n-th quote of a symbol is the same on every run whatever the
+    interleaving of requests.
+    """
+
+    name = "synthetic"
+
+    def __init__(
+        self,
+        latency: float = SYNTHETIC_LATENCY,
+        error_rate: float = SYNTHETIC_ERROR_RATE,
+        seed: int = SYNTHETIC_SEED,
+    ):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.seed = seed
+        self._rngs: Dict[str, random.Random] = {}
+        self._last: Dict[str, float] = {}
+        self.calls = 0
+        self.errors = 0
+
+    async def fetch_quote(self, symbol: str, api_key: str, priority: bool = False) -> Optional[float]:
+        rng = self._rngs.get(symbol)
+        if rng is None:
+            rng = self._rngs[symbol] = random.Random(f"{self.seed}:{symbol}")
+        self.calls += 1
+        latency = self.latency * rng.uniform(0.5, 1.5)
+        failed = rng.random() < self.error_rate
+        step = rng.gauss(0.0, 0.002)
+        if latency > 0:
+            await asyncio.sleep(latency)
+        if failed:
+            self.errors += 1
+            raise QuoteError(f"synthetic failure for {symbol}")
+
+        last = self._last.get(symbol)
+        if last is None:
+            last = 10.0 + (zlib.crc32(symbol.encode()) % 49000) / 100.0
+        price = round(last * (1.0 + step), 4)
+        self._last[symbol] = price
+        return price
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "latency": self.latency,
+            "error_rate": self.error_rate,
+            "seed": self.seed,
+            "calls": self.calls,
+            "errors": self.errors,
+        }
+
+
+class ReplayProvider(QuoteProvider):
+    """
+    Serves quotes recorded in a JSON lines file, cycling through the
+    recorded prices of each symbol in file order.
+    """
+
+    name = "replay"
+
+    def __init__(self, path: Path = QUOTE_REPLAY_PATH, latency: float = QUOTE_REPLAY_LATENCY):
+        self.path = Path(path)
+        self.latency = latency
+        self._quotes: Optional[Dict[str, List[float]]] = None
+        self._next: Dict[str, int] = {}
+        self.calls = 0
+
+    def _load(self) -> Dict[str, List[float]]:
+        quotes: Dict[str, List[float]] = {}
+        if self.path.exists():
+            with self.path.open("r", encoding="utf-8") as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        rec = json.loads(line)
+                        quotes.setdefault(rec["symbol"], []).append(float(rec["price"]))
+                    except (ValueError, KeyError, TypeError):
+                        continue
+        return quotes
+
+    async def start(self) -> None:
+        if self._quotes is None:
+            self._quotes = self._load()
+
+    async def fetch_quote(self, symbol: str, api_key: str, priority: bool = False) -> Optional[float]:
+        if self._quotes is None:
+            await self.start()
+        self.calls += 1
+        if self.latency > 0:
+            await asyncio.sleep(self.latency)
+        prices = self._quotes.get(symbol)
+        if not prices:
+            return None
+        idx = self._next.get(symbol, 0)
+        self._next[symbol] = idx + 1
+        return prices[idx % len(prices)]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "path": str(self.path),
+            "symbols": len(self._quotes or {}),
+            "calls": self.calls,
+        }
+
+
+class RecordingProvider(QuoteProvider):
+    """
+    Wraps another provider and appends every quote it returns to a file.
+    Records are buffered and written in batches by a worker thread, so the
+    event loop never waits on the disk.
+    """
+
+    def __init__(self, inner: QuoteProvider, path: Path):
+        self.inner = inner
+        self.path = Path(path)
+        self.name = inner.name
+        self._pending: List[str] = []
+        self._pending_since = 0.0
+        # Keeps batches in order when a flush is still writing.
+        self._write_lock = asyncio.Lock()
+        self.recorded = 0
+
+    async def start(self) -> None:
+        await self.inner.start()
+
+    async def close(self) -> None:
+        try:
+            await self.flush()
+        finally:
+            await self.inner.close()
+
+    async def fetch_quote(self, symbol: str, api_key: str, priority: bool = False) -> Optional[float]:
+        price = await self.inner.fetch_quote(symbol, api_key, priority=priority)
+        if price is not None:
+            now = time.time()
+            if not self._pending:
+                self._pending_since = now
+            self._pending.append(json.dumps({"symbol": symbol, "price": price, "time": now}) + "\n")
+            if (
+                len(self._pending) >= QUOTE_RECORD_FLUSH_EVERY
+                or now - self._pending_since >= QUOTE_RECORD_FLUSH_SECONDS
+            ):
+                await self.flush()
+        return price
+
+    async def flush(self) -> None:
+        """Write every buffered record."""
+        if not self._pending:
+            return
+        lines, self._pending = self._pending, []
+        async with self._write_lock:
+            await asyncio.to_thread(self._write, "".join(lines))
+        self.recorded += len(lines)
+
+    def _write(self, text: str) -> None:
+        with self.path.open("a", encoding="utf-8") as f:
+            f.write(text)
+
+    def stats(self) -> Dict[str, Any]:
+        stats = self.inner.stats()
+        stats["recording_to"] = str(self.path)
+        stats["recorded"] = self.recorded
+        stats["record_pending"] = len(self._pending)
+        return stats
+
+
+_PROVIDER_TYPES = {
+    FinnhubProvider.name: FinnhubProvider,
+    SyntheticProvider.name: SyntheticProvider,
+    ReplayProvider.name: ReplayProvider,
+}
+
+_PROVIDER: Optional[QuoteProvider] = None
+
+
+def get_quote_provider() -> QuoteProvider:
+    """Return the configured provider, creating it on first use."""
+    global _PROVIDER
+    if _PROVIDER is None:
+        provider_type = _PROVIDER_TYPES.get(QUOTE_PROVIDER, FinnhubProvider)
+        provider = provider_type()
+        if QUOTE_RECORD_PATH:
+            provider = RecordingProvider(provider, Path(QUOTE_RECORD_PATH))
+        _PROVIDER = provider
+    return _PROVIDER
+
+
+def set_quote_provider(provider: QuoteProvider) -> None:
+    """Swap the provider at runtime (benchmarks, scripted load tests)."""
+    global _PROVIDER
+    _PROVIDER = provider
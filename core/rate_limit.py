@@ -0,0 +1,109 @@
+import asyncio
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional, Tuple
+
+
+class TokenBucket:
+    """
+    Async token bucket: `rate` tokens per second, bursts up to `capacity`.
+
+    Callers await acquire(); priority callers are served before any normal
+    caller that is already waiting. pause() empties the bucket and blocks
+    everyone for a while (used when upstream answers 429).
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        # (priority waiters, normal waiters)
+        self._waiters: Tuple[Deque[asyncio.Future], Deque[asyncio.Future]] = (deque(), deque())
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self.granted = 0
+        self.waited = 0
+        self.pauses = 0
+
+    def _refill(self, now: float) -> None:
+        start = max(self._updated, self._blocked_until)
+        if now > start:
+            self._tokens = min(self.capacity, self._tokens + (now - start) * self.rate)
+        self._updated = max(self._updated, now)
+
+    def _purge(self) -> None:
+        for queue in self._waiters:
+            while queue and queue[0].done():
+                queue.popleft()
+
+    async def acquire(self, priority: bool = False) -> None:
+        now = time.monotonic()
+        self._refill(now)
+        self._purge()
+        ahead = self._waiters[0] if priority else (self._waiters[0] or self._waiters[1])
+        if not ahead and now >= self._blocked_until and self._tokens >= 1:
+            self._tokens -= 1
+            self.granted += 1
+            return
+
+        fut = asyncio.get_running_loop().create_future()
+        self._waiters[0 if priority else 1].append(fut)
+        self.waited += 1
+        self._schedule()
+        await fut
+
+    def pause(self, seconds: float) -> None:
+        """Drop all tokens and grant nothing for the next `seconds`."""
+        now = time.monotonic()
+        self._refill(now)
+        self._tokens = 0.0
+        self._blocked_until = max(self._blocked_until, now + seconds)
+        self.pauses += 1
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        self._purge()
+        if any(self._waiters):
+            self._schedule()
+
+    def _schedule(self) -> None:
+        if self._timer is not None:
+            return
+        now = time.monotonic()
+        self._refill(now)
+        wait = max(self._blocked_until - now, 0.0) + max(1.0 - self._tokens, 0.0) / self.rate
+        # Small margin so the timer does not fire a hair before the token is due.
+        self._timer = asyncio.get_running_loop().call_later(wait + 0.001, self._release)
+
+    def _release(self) -> None:
+        self._timer = None
+        now = time.monotonic()
+        self._refill(now)
+        if now >= self._blocked_until:
+            for queue in self._waiters:
+                while queue and self._tokens >= 1:
+                    fut = queue.popleft()
+                    if fut.done():
+                        continue
+                    fut.set_result(None)
+                    self._tokens -= 1
+                    self.granted += 1
+        self._purge()
+        if any(self._waiters):
+            self._schedule()
+
+    def stats(self) -> Dict[str, Any]:
+        self._refill(time.monotonic())
+        self._purge()
+        return {
+            "rate_per_sec": self.rate,
+            "capacity": self.capacity,
+            "tokens": round(self._tokens, 3),
+            "blocked_for": max(self._blocked_until - time.monotonic(), 0.0),
+            "waiting_priority": len(self._waiters[0]),
+            "waiting": len(self._waiters[1]),
+            "granted": self.granted,
+            "waited": self.waited,
+            "pauses": self.pauses,
+        }
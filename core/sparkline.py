@@ -0,0 +1,91 @@
+from typing import Sequence, Tuple
+
+import numpy as np
+
+from core.timeseries import lttb
+
+SPARKLINE_WIDTH = 300
+SPARKLINE_HEIGHT = 150
+SPARKLINE_STROKE = "#1976D2"
+SPARKLINE_FILL = "#BBDEFB"
+# Points kept per horizontal pixel after LTTB; more adds bytes, not detail.
+SPARKLINE_POINTS_PER_PX = 2
+
+# Inner padding so the stroke is not clipped at the edges.
+_PAD = 2.0
+
+
+def _scale(data: np.ndarray, size: float, flip: bool) -> np.ndarray:
+    lo, hi = float(data.min()), float(data.max())
+    span = hi - lo
+    if span == 0:
+        scaled = np.full(len(data), 0.5)
+    else:
+        scaled = (data - lo) / span
+    if flip:
+        scaled = 1.0 - scaled
+    return _PAD + scaled * (size - 2 * _PAD)
+
+
+def _sparkline_shapes(times: np.ndarray, values: np.ndarray, width: int, height: int) -> str:
+    if len(times) == 0:
+        return ""
+    times, values = lttb(times, values, width * SPARKLINE_POINTS_PER_PX)
+    if len(times) == 1:
+        # One point: draw it as a flat line across the box.
+        times = np.array([0.0, 1.0])
+        values = np.repeat(values, 2)
+    xs = _scale(times, width, flip=False)
+    ys = _scale(values, height, flip=True)
+    line = " ".join(f"{x:.1f},{y:.1f}" for x, y in zip(xs.tolist(), ys.tolist()))
+    base = height - _PAD
+    area = f"{xs[0]:.1f},{base:.1f} {line} {xs[-1]:.1f},{base:.1f}"
+    return (
+        f'<polygon points="{area}" fill="{SPARKLINE_FILL}"/>'
+        f'<polyline points="{line}" fill="none" stroke="{SPARKLINE_STROKE}" '
+        'stroke-width="1.2" vector-effect="non-scaling-stroke"/>'
+    )
+
+
+def render_sparkline_svg(
+    times: np.ndarray,
+    values: np.ndarray,
+    width: int = SPARKLINE_WIDTH,
+    height: int = SPARKLINE_HEIGHT,
+) -> str:
+    """
+    Filled line sparkline as a standalone SVG document, drawn straight from
+    the history arrays (no matplotlib). Long series are reduced with LTTB
+    first, so the output size is bounded by the width.
+    """
+    return (
+        f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 {width} {height}" '
+        f'width="{width}" height="{height}" preserveAspectRatio="none">'
+        + _sparkline_shapes(times, values, width, height)
+        + "</svg>"
+    )
+
+
+def sparkline_symbol_id(index: int) -> str:
+    return f"spark-{index}"
+
+
+def render_sparkline_sprite(
+    series: Sequence[Tuple[np.ndarray, np.ndarray]],
+    width: int = SPARKLINE_WIDTH,
+    height: int = SPARKLINE_HEIGHT,
+) -> str:
+    """
+    Several sparklines in one SVG document, one <symbol> per series with
+    id sparkline_symbol_id(i), for pages to reference with <use href>.
+    """
+    parts = ['<svg xmlns="http://www.w3.org/2000/svg">']
+    for i, (times, values) in enumerate(series):
+        parts.append(
+            f'<symbol id="{sparkline_symbol_id(i)}" viewBox="0 0 {width} {height}" '
+            'preserveAspectRatio="none">'
+        )
+        parts.append(_sparkline_shapes(times, values, width, height))
+        parts.append("</symbol>")
+    parts.append("</svg>")
+    return "".join(parts)
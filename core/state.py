@@ -1,5 +1,12 @@
 from typing import Dict, Optional
-from backup_utils import PORTFOLIOS, PORTFOLIO_HISTORY, DEFAULT_PORTFOLIO
+from backup_utils import (
+    PORTFOLIOS,
+    PORTFOLIO_HISTORY,
+    DEFAULT_PORTFOLIO,
+    bump_state_version,
+    new_portfolio,
+)
+from core.symbol_index import SYMBOL_INDEX
 
 FINNHUB_API_KEY = ""
 
@@ -26,10 +33,8 @@ def resolve_portfolio(q: Optional[str]) -> str:
         return next(iter(PORTFOLIOS.keys()))
 
     DEFAULT_PORTFOLIO = "Default"
-    PORTFOLIOS[DEFAULT_PORTFOLIO] = {
-        "tickers": [],
-        "positions": {},
-        "transactions": [],
-    }
+    PORTFOLIOS[DEFAULT_PORTFOLIO] = new_portfolio()
+    SYMBOL_INDEX.reindex(DEFAULT_PORTFOLIO, PORTFOLIOS[DEFAULT_PORTFOLIO])
+    bump_state_version()
     return DEFAULT_PORTFOLIO
 
@@ -0,0 +1,93 @@
+from typing import Any, Dict, Mapping, Set, Tuple
+
+
+def _has_position(pf: Mapping[str, Any], symbol: str) -> bool:
+    pos = pf["positions"].get(symbol)
+    return bool(pos) and pos.get("qty") is not None and pos.get("buy") is not None
+
+
+class SymbolIndex:
+    """
+    Inverted index from symbol to portfolios, for the cross-portfolio
+    summary.
+
+    `listed` maps a symbol to the portfolios whose ticker list has it (the
+    summary has one row per such symbol); `holders` maps it to the
+    portfolios with a position in it (the populated cells). Routes that
+    touch one symbol call update(); bulk changes reindex one portfolio.
+    """
+
+    def __init__(self):
+        self._listed: Dict[str, Set[str]] = {}
+        self._holders: Dict[str, Set[str]] = {}
+        # Symbols each portfolio appears under, so it can be dropped quickly.
+        self._by_portfolio: Dict[str, Set[str]] = {}
+        self._symbols: Tuple[str, ...] = ()
+        self._symbols_dirty = False
+
+    def update(self, name: str, pf: Mapping[str, Any], symbol: str) -> None:
+        """Re-read one symbol of one portfolio."""
+        self._set(self._listed, symbol, name, symbol in pf["tickers"], True)
+        self._set(self._holders, symbol, name, _has_position(pf, symbol), False)
+        owned = self._by_portfolio.setdefault(name, set())
+        if name in self._listed.get(symbol, ()) or name in self._holders.get(symbol, ()):
+            owned.add(symbol)
+        else:
+            owned.discard(symbol)
+
+    def reindex(self, name: str, pf: Mapping[str, Any]) -> None:
+        """Re-read a whole portfolio, e.g. after an import."""
+        self.drop(name)
+        for symbol in set(pf["tickers"]).union(pf["positions"]):
+            self.update(name, pf, symbol)
+
+    def drop(self, name: str) -> None:
+        for symbol in self._by_portfolio.pop(name, ()):
+            self._set(self._listed, symbol, name, False, True)
+            self._set(self._holders, symbol, name, False, False)
+
+    def rename(self, old: str, new: str) -> None:
+        symbols = self._by_portfolio.pop(old, set())
+        self._by_portfolio[new] = symbols
+        for symbol in symbols:
+            for table in (self._listed, self._holders):
+                owners = table.get(symbol)
+                if owners is not None and old in owners:
+                    owners.discard(old)
+                    owners.add(new)
+
+    def rebuild(self, portfolios: Mapping[str, Mapping[str, Any]]) -> None:
+        self._listed.clear()
+        self._holders.clear()
+        self._by_portfolio.clear()
+        self._symbols_dirty = True
+        for name, pf in portfolios.items():
+            self.reindex(name, pf)
+
+    def symbols(self) -> Tuple[str, ...]:
+        """Every listed symbol, sorted."""
+        if self._symbols_dirty:
+            self._symbols = tuple(sorted(self._listed))
+            self._symbols_dirty = False
+        return self._symbols
+
+    def holders(self, symbol: str) -> Set[str]:
+        return self._holders.get(symbol, set())
+
+    def _set(self, table: Dict[str, Set[str]], symbol: str, name: str, present: bool, listed: bool) -> None:
+        owners = table.get(symbol)
+        if present:
+            if owners is None:
+                owners = table[symbol] = set()
+                if listed:
+                    self._symbols_dirty = True
+            owners.add(name)
+        elif owners is not None:
+            owners.discard(name)
+            if not owners:
+                del table[symbol]
+                if listed:
+                    self._symbols_dirty = True
+
+
+SYMBOL_INDEX = SymbolIndex()
@@ -0,0 +1,100 @@
+from string import Formatter
+from typing import Any, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+_FORMATTER = Formatter()
+
+# (literal text, field name or None, conversion, format spec)
+_Part = Tuple[str, Optional[str], Optional[str], str]
+
+
+class Template:
+    """
+    A str.format-style template, parsed once into fragments.
+
+    Each fragment is a literal chunk followed by at most one field, so a
+    render formats the fields and joins everything with one "".join; the
+    template text itself is never parsed again. Fields given as keyword
+    arguments at construction are bound for good and folded into the
+    literal chunks. render() ignores extra keys; render_rows() formats a
+    whole table into one list and joins it once.
+    """
+
+    __slots__ = ("source", "fields", "_bound", "_parts")
+
+    def __init__(self, source: str, **bound: Any):
+        self.source = source
+        self._bound = bound
+        parts: List[_Part] = []
+        fields: List[str] = []
+        pending = ""
+        for literal, field, spec, conversion in _FORMATTER.parse(source):
+            pending += literal
+            if field is None:
+                continue
+            if field in bound:
+                value = _FORMATTER.convert_field(bound[field], conversion)
+                pending += format(value, spec or "")
+                continue
+            if not field.isidentifier():
+                raise ValueError(f"template field must be a plain name: {field!r}")
+            if field not in fields:
+                fields.append(field)
+            parts.append((pending, field, conversion, spec or ""))
+            pending = ""
+        if pending:
+            parts.append((pending, None, None, ""))
+        self.fields: Tuple[str, ...] = tuple(fields)
+        self._parts: Tuple[_Part, ...] = tuple(parts)
+
+    def _extend(self, out: List[str], values: Mapping[str, Any]) -> None:
+        append = out.append
+        for literal, field, conversion, spec in self._parts:
+            append(literal)
+            if field is not None:
+                value = values[field]
+                if conversion:
+                    value = _FORMATTER.convert_field(value, conversion)
+                append(format(value, spec))
+
+    def render(self, **values: Any) -> str:
+        out: List[str] = []
+        self._extend(out, values)
+        return "".join(out)
+
+    def bind(self, **bound: Any) -> "Template":
+        """A new template with more fields bound."""
+        return Template(self.source, **{**self._bound, **bound})
+
+    def render_rows(self, rows: Iterable[Mapping[str, Any]]) -> str:
+        """Render one fragment per mapping and join them all in a single pass."""
+        out: List[str] = []
+        for row in rows:
+            self._extend(out, row)
+        return "".join(out)
+
+
+def fragments(source: str, fields: Sequence[str]) -> Tuple[str, ...]:
+    """
+    The literal text around each field of a str.format source: one more
+    chunk than there are fields. For the big-table row renderers, which
+    interleave their values with these chunks by hand, so a row costs no
+    new string beyond its values. `fields` must name the source's fields
+    in order, which keeps a renderer and its markup from drifting apart;
+    formatting is left to the renderer, so fields carry no spec.
+    """
+    chunks: List[str] = []
+    found: List[str] = []
+    pending = ""
+    for literal, field, spec, conversion in _FORMATTER.parse(source):
+        pending += literal
+        if field is None:
+            continue
+        if spec or conversion:
+            raise ValueError(f"row fragment field takes no format spec: {field!r}")
+        found.append(field)
+        chunks.append(pending)
+        pending = ""
+    chunks.append(pending)
+    if tuple(found) != tuple(fields):
+        raise ValueError(f"template fields {found} do not match {list(fields)}")
+    return tuple(chunks)
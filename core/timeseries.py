@@ -0,0 +1,109 @@
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from core.columnar import HistorySeries, now_ts
+
+MINUTE = 60
+HOUR = 60 * MINUTE
+DAY = 24 * HOUR
+
+# Retention tiers for portfolio history, newest first:
+# (max age in seconds, bucket size in seconds). Points younger than the
+# first tier's age are kept as is; older points keep only the last point
+# of each bucket. The last tier has no age limit.
+HISTORY_TIERS: List[Tuple[Optional[float], Optional[int]]] = [
+    (1 * DAY, None),
+    (3 * DAY, MINUTE),
+    (30 * DAY, HOUR),
+    (None, DAY),
+]
+
+# Compact a portfolio's history once this many points were added since
+# its last compaction.
+HISTORY_COMPACT_EVERY = 60
+
+
+def downsample_history(series: HistorySeries, now: Optional[float] = None) -> HistorySeries:
+    """
+    Apply HISTORY_TIERS to a time-ordered series in place, keeping the last
+    point of every bucket. Returns the same series for convenience.
+    """
+    series.appended = 0
+    n = len(series)
+    if n < 2:
+        return series
+    times, values = series.as_numpy()
+    age = (now_ts() if now is None else now) - times
+
+    # Bucket size per point; 0 means "keep as is".
+    sizes = np.zeros(n)
+    lower = -np.inf
+    for max_age, bucket in HISTORY_TIERS:
+        upper = np.inf if max_age is None else max_age
+        if bucket:
+            sizes[(age >= lower) & (age < upper)] = bucket
+        lower = upper
+
+    keys = np.floor(times / np.where(sizes > 0, sizes, 1.0))
+    keep = np.ones(n, dtype=bool)
+    same_bucket = (sizes[:-1] > 0) & (sizes[:-1] == sizes[1:]) & (keys[:-1] == keys[1:])
+    keep[:-1] = ~same_bucket
+    if keep.all():
+        return series
+    series.replace(times[keep], values[keep], series.costs_as_numpy()[keep])
+    return series
+
+
+
+def compact_after_append(series: HistorySeries) -> None:
+    """
+    Count one added point and compact every HISTORY_COMPACT_EVERY of them.
+    Amortized: each compaction is paid for by that many appends, and older
+    points are folded into coarser buckets, so the series stays bounded
+    however long the service runs.
+    """
+    series.appended += 1
+    if series.appended >= HISTORY_COMPACT_EVERY:
+        downsample_history(series)
+
+def lttb(times: np.ndarray, values: np.ndarray, threshold: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Largest-Triangle-Three-Buckets downsampling of a time-ordered series to
+    at most `threshold` points. First and last points are always kept.
+    """
+    n = len(times)
+    if threshold >= n:
+        return times, values
+    if threshold < 3:
+        # Too few points for triangles: keep the end points.
+        idx = np.array([0, n - 1][:max(threshold, 0)], dtype=np.int64)
+        return times[idx], values[idx]
+
+    # Bucket edges for the n - 2 inner points, split into threshold - 2 buckets.
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+
+    a = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        # Average of the next bucket (or the last point for the final one).
+        if i + 2 < len(edges):
+            nxt_start, nxt_end = edges[i + 1], edges[i + 2]
+            avg_t = times[nxt_start:nxt_end].mean()
+            avg_v = values[nxt_start:nxt_end].mean()
+        else:
+            avg_t, avg_v = times[n - 1], values[n - 1]
+
+        bucket_t = times[start:end]
+        bucket_v = values[start:end]
+        areas = np.abs(
+            (times[a] - avg_t) * (bucket_v - values[a])
+            - (times[a] - bucket_t) * (avg_v - values[a])
+        )
+        a = start + int(np.argmax(areas))
+        selected[i + 1] = a
+
+    return times[selected], values[selected]
@@ -0,0 +1,185 @@
+import json
+from typing import Any, Dict, List, Optional
+
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import Response
+
+from backup_utils import PORTFOLIOS
+from config.summary_order import get_portfolio_summary_order
+from core.history_query import HISTORY_PAGE_MAX, HISTORY_PAGE_SIZE, query_transactions
+from core.portfolio_stats import PORTFOLIO_STATS
+from core.price_poller import get_price_snapshot
+from routers.ui_constants import TAG_LABELS
+from routers.ui_helpers import positions_data, sidebar_data, summary_data
+
+try:
+    import orjson
+except ImportError:  # optional, only makes serialization faster
+    orjson = None
+
+router = APIRouter(prefix="/api/v1", tags=["api"])
+
+POSITION_FIELDS = ("symbol", "price", "stale", "qty", "buy", "cost_basis", "pl", "pl_pct", "note")
+SUMMARY_CELL_FIELDS = ("has_pos", "qty", "buy", "cost", "pl_price", "pl_pct", "tag", "tag_label")
+SIDEBAR_FIELDS = ("portfolio", "total_value", "total_cost", "pl")
+TRANSACTION_FIELDS = ("time", "portfolio", "symbol", "action", "qty", "price", "note")
+
+
+class FastJSONResponse(Response):
+    """
+    JSON rendered straight to bytes, skipping FastAPI's jsonable_encoder
+    pass. Uses orjson when installed.
+    """
+
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        if orjson is not None:
+            return orjson.dumps(content)
+        return json.dumps(content, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def _parse_fields(fields: Optional[str], allowed: tuple) -> Optional[List[str]]:
+    if not fields:
+        return None
+    names = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = [f for f in names if f not in allowed]
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown field(s): {', '.join(unknown)}. Allowed: {', '.join(allowed)}",
+        )
+    return names
+
+
+def _select(rows: List[Dict[str, Any]], names: Optional[List[str]]) -> List[Dict[str, Any]]:
+    if names is None:
+        return rows
+    return [{name: row[name] for name in names} for row in rows]
+
+
+def _portfolio_or_404(name: str) -> Dict[str, Any]:
+    pf = PORTFOLIOS.get(name)
+    if pf is None:
+        raise HTTPException(status_code=404, detail=f"Unknown portfolio: {name}")
+    return pf
+
+
+def _prices_meta() -> Dict[str, Any]:
+    snapshot = get_price_snapshot()
+    return {"prices_version": snapshot.version, "prices_updated_at": snapshot.updated_at}
+
+
+@router.get("/portfolios", response_class=FastJSONResponse)
+async def api_portfolios():
+    return FastJSONResponse({"portfolios": get_portfolio_summary_order()})
+
+
+@router.get("/portfolios/{portfolio_name}/positions", response_class=FastJSONResponse)
+async def api_positions(
+    portfolio_name: str,
+    sort_by: str = Query("symbol"),
+    sort_dir: str = Query("asc"),
+    fields: Optional[str] = Query(None, description="Comma separated subset of position fields"),
+):
+    names = _parse_fields(fields, POSITION_FIELDS)
+    pf = _portfolio_or_404(portfolio_name)
+    snapshot = get_price_snapshot()
+    rows, total_pl = positions_data(
+        pf["tickers"],
+        pf["positions"],
+        PORTFOLIO_STATS.get(portfolio_name, pf).latest_notes,
+        snapshot.prices,
+        sort_by,
+        sort_dir,
+        stale_symbols=snapshot.stale,
+    )
+    return FastJSONResponse(
+        {
+            "portfolio": portfolio_name,
+            **_prices_meta(),
+            "total_pl": total_pl,
+            "positions": _select(rows, names),
+        }
+    )
+
+
+@router.get("/summary", response_class=FastJSONResponse)
+async def api_summary(
+    active: Optional[str] = Query(None, description="Portfolio whose cells drive the sort"),
+    sort_by: str = Query("symbol"),
+    sort_dir: str = Query("asc"),
+    fields: Optional[str] = Query(None, description="Comma separated subset of cell fields"),
+):
+    names = _parse_fields(fields, SUMMARY_CELL_FIELDS)
+    portfolio_names = get_portfolio_summary_order()
+    active_name = active if active in PORTFOLIOS else (portfolio_names[0] if portfolio_names else "")
+    rows = summary_data(active_name, portfolio_names, get_price_snapshot().prices, sort_by, sort_dir)
+
+    out_rows = []
+    for row in rows:
+        cells = {}
+        for pfname, cell in row["cells"].items():
+            tag = cell.get("tag")
+            cell = dict(cell, tag_label=TAG_LABELS[tag] if tag is not None and 0 <= tag < len(TAG_LABELS) else None)
+            cells[pfname] = cell if names is None else {name: cell[name] for name in names}
+        out_rows.append({"symbol": row["symbol"], "cells": cells})
+
+    return FastJSONResponse(
+        {
+            **_prices_meta(),
+            "portfolios": portfolio_names,
+            "active": active_name,
+            "rows": out_rows,
+        }
+    )
+
+
+@router.get("/sidebar", response_class=FastJSONResponse)
+async def api_sidebar(
+    fields: Optional[str] = Query(None, description="Comma separated subset of card fields"),
+):
+    names = _parse_fields(fields, SIDEBAR_FIELDS)
+    cards = sidebar_data(get_portfolio_summary_order(), get_price_snapshot().prices)
+    return FastJSONResponse({**_prices_meta(), "portfolios": _select(cards, names)})
+
+
+def _transactions_payload(sources, sort_by, sort_dir, q, cursor, limit, fields) -> Dict[str, Any]:
+    names = _parse_fields(fields, TRANSACTION_FIELDS)
+    page = query_transactions(sources, sort_by, sort_dir, q or "", cursor, limit)
+    return {
+        "total": page.total,
+        "matched": page.matched,
+        "next_cursor": page.next_cursor,
+        "transactions": _select(page.rows, names),
+    }
+
+
+@router.get("/portfolios/{portfolio_name}/transactions", response_class=FastJSONResponse)
+async def api_portfolio_transactions(
+    portfolio_name: str,
+    sort_by: str = Query("time"),
+    sort_dir: str = Query("desc"),
+    q: Optional[str] = Query(None, description="Any text in row"),
+    cursor: Optional[str] = Query(None),
+    limit: int = Query(HISTORY_PAGE_SIZE, ge=1, le=HISTORY_PAGE_MAX),
+    fields: Optional[str] = Query(None, description="Comma separated subset of transaction fields"),
+):
+    pf = _portfolio_or_404(portfolio_name)
+    payload = _transactions_payload(
+        [(portfolio_name, pf["transactions"])], sort_by, sort_dir, q, cursor, limit, fields
+    )
+    return FastJSONResponse({"portfolio": portfolio_name, **payload})
+
+
+@router.get("/transactions", response_class=FastJSONResponse)
+async def api_transactions(
+    sort_by: str = Query("time"),
+    sort_dir: str = Query("desc"),
+    q: Optional[str] = Query(None, description="Any text in row"),
+    cursor: Optional[str] = Query(None),
+    limit: int = Query(HISTORY_PAGE_SIZE, ge=1, le=HISTORY_PAGE_MAX),
+    fields: Optional[str] = Query(None, description="Comma separated subset of transaction fields"),
+):
+    sources = [(name, pf["transactions"]) for name, pf in PORTFOLIOS.items()]
+    return FastJSONResponse(_transactions_payload(sources, sort_by, sort_dir, q, cursor, limit, fields))
@@ -1,37 +1,63 @@
-from fastapi import APIRouter
-from fastapi.responses import Response
-import io
-import matplotlib.pyplot as plt
+import json
 
-from backup_utils import PORTFOLIO_HISTORY
+from fastapi import APIRouter, Query, Request
+from typing import List, Optional
+
+from backup_utils import PORTFOLIOS, history_arrays, history_version
+from core.chart_cache import cached_chart_response
+from core.chart_render import render_history_png, run_render
+from core.sparkline import render_sparkline_sprite, render_sparkline_svg
 
 router = APIRouter()
 
 @router.get("/chart/{portfolio_name}")
-async def chart(portfolio_name: str):
-    if portfolio_name not in PORTFOLIO_HISTORY or not PORTFOLIO_HISTORY[portfolio_name]:
-        buf = io.BytesIO()
-        plt.figure(figsize=(2, 1))
-        plt.axis("off")
-        plt.savefig(buf, format="png", dpi=100, bbox_inches="tight", pad_inches=0)
-        plt.close()
-        buf.seek(0)
-        return Response(content=buf.getvalue(), media_type="image/png")
-
-    hist = PORTFOLIO_HISTORY[portfolio_name]
-    times = [h["time"] for h in hist]
-    values = [h["value"] for h in hist]
-
-    plt.figure(figsize=(3, 1.5))
-    plt.plot(times, values, color="#1976D2", linewidth=1.2)
-    plt.fill_between(times, values, color="#BBDEFB")
-    plt.xticks([], [])
-    plt.yticks([], [])
-    plt.tight_layout()
-
-    buf = io.BytesIO()
-    plt.savefig(buf, format="png", dpi=120)
-    plt.close()
-    buf.seek(0)
-    return Response(content=buf.getvalue(), media_type="image/png")
+async def chart(portfolio_name: str, request: Request):
+    async def render() -> bytes:
+        # Only on a cache miss: snapshot the arrays here, on the event
+        # loop; the render thread only ever sees its own copies.
+        times, values = history_arrays(portfolio_name)
+        return await run_render(lambda: render_history_png(times, values))
+
+    return await cached_chart_response(
+        request, "png", portfolio_name, history_version(portfolio_name), render
+    )
+
+
+@router.get("/sparkline/{portfolio_name}")
+async def sparkline(portfolio_name: str, request: Request):
+    async def render() -> bytes:
+        return render_sparkline_svg(*history_arrays(portfolio_name)).encode()
+
+    return await cached_chart_response(
+        request,
+        "svg",
+        portfolio_name,
+        history_version(portfolio_name),
+        render,
+        media_type="image/svg+xml",
+    )
+
+
+@router.get("/sparklines")
+async def sparklines(
+    request: Request,
+    portfolios: Optional[List[str]] = Query(None, description="One parameter per name; all if omitted"),
+):
+    """
+    Every requested portfolio's sparkline in one SVG sprite; symbol i
+    (id "spark-i") is the i-th portfolio of the list.
+    """
+    names = list(portfolios) if portfolios else list(PORTFOLIOS.keys())
+    version = "-".join(str(history_version(name)) for name in names)
+
+    async def render() -> bytes:
+        return render_sparkline_sprite([history_arrays(name) for name in names]).encode()
 
+    return await cached_chart_response(
+        request,
+        "sprite",
+        json.dumps(names),
+        version,
+        render,
+        media_type="image/svg+xml",
+    )
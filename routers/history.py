@@ -0,0 +1,71 @@
+from typing import Any, Dict, List, Optional
+
+from fastapi import APIRouter, HTTPException, Query
+
+from backup_utils import PORTFOLIO_HISTORY, PORTFOLIOS
+from core.columnar import format_time, parse_time
+from core.timeseries import lttb
+
+router = APIRouter(prefix="/history", tags=["history"])
+
+DEFAULT_POINTS = 500
+MAX_POINTS = 5000
+
+
+def _parse_bound(value: Optional[str], name: str) -> Optional[float]:
+    if not value:
+        return None
+    try:
+        return parse_time(value.strip())
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid {name}: {value}")
+
+
+def _series_payload(
+    name: str,
+    start: Optional[float],
+    end: Optional[float],
+    points: int,
+) -> Dict[str, Any]:
+    hist = PORTFOLIO_HISTORY.get(name)
+    if hist is None:
+        times = values = ()
+        total = 0
+    else:
+        times, values = hist.range(start, end)
+        total = len(times)
+        times, values = lttb(times, values, points)
+    return {
+        "portfolio": name,
+        "total_points": total,
+        "times": [format_time(t) for t in times.tolist()] if total else [],
+        "values": values.tolist() if total else [],
+    }
+
+
+@router.get("")
+async def history_multi(
+    portfolios: Optional[List[str]] = Query(None, description="One parameter per name; all if omitted"),
+    start: Optional[str] = Query(None, description="e.g. 2025-01-01 or 2025-01-01 09:30:00"),
+    end: Optional[str] = Query(None),
+    points: int = Query(DEFAULT_POINTS, ge=2, le=MAX_POINTS),
+):
+    start_ts = _parse_bound(start, "start")
+    end_ts = _parse_bound(end, "end")
+    names = list(portfolios) if portfolios else list(PORTFOLIOS.keys())
+    unknown = [n for n in names if n not in PORTFOLIOS and n not in PORTFOLIO_HISTORY]
+    if unknown:
+        raise HTTPException(status_code=404, detail=f"Unknown portfolio(s): {', '.join(unknown)}")
+    return {"series": [_series_payload(n, start_ts, end_ts, points) for n in names]}
+
+
+@router.get("/{portfolio_name}")
+async def history_single(
+    portfolio_name: str,
+    start: Optional[str] = Query(None, description="e.g. 2025-01-01 or 2025-01-01 09:30:00"),
+    end: Optional[str] = Query(None),
+    points: int = Query(DEFAULT_POINTS, ge=2, le=MAX_POINTS),
+):
+    if portfolio_name not in PORTFOLIOS and portfolio_name not in PORTFOLIO_HISTORY:
+        raise HTTPException(status_code=404, detail=f"Unknown portfolio: {portfolio_name}")
+    return _series_payload(portfolio_name, _parse_bound(start, "start"), _parse_bound(end, "end"), points)
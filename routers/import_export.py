@@ -1,8 +1,8 @@
 # routers/import_export.py
 
-from fastapi import APIRouter, Form, Query, UploadFile, File
+from fastapi import APIRouter, Form, HTTPException, Query, UploadFile, File
 from fastapi.responses import RedirectResponse, StreamingResponse, Response
-from typing import List, Dict, Optional
+from typing import List, Dict
 from datetime import datetime
 import io
 import csv
@@ -10,73 +10,45 @@ import openpyxl
 
 from backup_utils import (
     PORTFOLIOS,
-    PORTFOLIO_HISTORY,
     DEFAULT_PORTFOLIO,
+    bump_state_version,
+    new_portfolio,
     rebuild_portfolio_history_from_transactions,
 )
+from core.columnar import TransactionLog
+from core.portfolio_stats import PORTFOLIO_STATS
+from core.symbol_index import SYMBOL_INDEX
 from core.state import resolve_portfolio  # your shared resolve helper
 from core.state import TAGS  # tags dict shared with UI
 
 router = APIRouter()
 
 
-@router.post("/importcsv")
-async def importcsv(
-    portfolioname: str = Form(...),
-    file: UploadFile = File(...),
-):
-    pname = portfolioname.strip() or DEFAULT_PORTFOLIO
-
-    content = await file.read()
-    if not content:
-        return RedirectResponse(
-            url=f"/?portfolio={pname}&error=Uploaded CSV is empty.",
-            status_code=303,
-        )
-
-    text = content.decode("utf-8", errors="ignore")
-    reader = csv.DictReader(io.StringIO(text))
-
-    required_cols = [
-        "Symbol",
-        "Current Price",
-        "Trade Date",
-        "Purchase Price",
-        "Quantity",
-    ]
-    if not reader.fieldnames:
-        return RedirectResponse(
-            url=f"/?portfolio={pname}&error=CSV has no header row.",
-            status_code=303,
-        )
-    for col in required_cols:
-        if col not in reader.fieldnames:
-            return RedirectResponse(
-                url=f"/?portfolio={pname}&error=CSV missing required column {col}",
-                status_code=303,
-            )
+def _number(value, row_no: int, col: str) -> float:
+    """A numeric cell; a bad one rejects the whole upload with a 400."""
+    try:
+        return float(value or 0.0)
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail=f"Row {row_no}: invalid {col}: {value!r}")
 
-    if pname not in PORTFOLIOS:
-        PORTFOLIOS[pname] = {
-            "tickers": [],
-            "positions": {},
-            "transactions": [],
-        }
 
-    pf = PORTFOLIOS[pname]
+def _parse_csv(reader: csv.DictReader, pname: str, note: str):
+    """
+    (positions, transactions) from an import CSV. Every row is parsed
+    before the caller touches any state, so a bad row changes nothing.
+    """
     positions: Dict[str, Dict[str, float]] = {}
     transactions: List[Dict] = []
-    PORTFOLIO_HISTORY[pname] = []
-    TAGS[pname] = {}
 
-    for row in reader:
+    # Row 1 is the header.
+    for row_no, row in enumerate(reader, 2):
         symbol = (row["Symbol"] or "").strip().upper()
         if not symbol:
             continue
 
         tradedate_raw = (row["Trade Date"] or "").strip()
-        buyprice = float(row["Purchase Price"] or 0.0)
-        qty = float(row["Quantity"] or 0.0)
+        buyprice = _number(row["Purchase Price"], row_no, "Purchase Price")
+        qty = _number(row["Quantity"], row_no, "Quantity")
 
         if not tradedate_raw or len(tradedate_raw) != 8:
             tradedt = datetime.now()
@@ -111,15 +83,66 @@ async def importcsv(
                 "action": "BUY",
                 "qty": qty,
                 "price": buyprice,
-                "note": f"Imported from CSV at {datetime.now().strftime('%Y-%m-%d %H:%M')}",
+                "note": f"{note} at {datetime.now().strftime('%Y-%m-%d %H:%M')}",
             }
         )
+    return positions, transactions
+
 
+def _replace_portfolio(pname: str, positions: Dict[str, Dict[str, float]], transactions: List[Dict]) -> None:
+    """Swap in an imported portfolio and bring the indexes up to date."""
+    if pname not in PORTFOLIOS:
+        PORTFOLIOS[pname] = new_portfolio()
+    pf = PORTFOLIOS[pname]
+    TAGS[pname] = {}
     pf["tickers"] = sorted(positions.keys())
     pf["positions"] = positions
-    pf["transactions"] = transactions
+    pf["transactions"] = TransactionLog.from_records(transactions)
     rebuild_portfolio_history_from_transactions(pname)
+    SYMBOL_INDEX.reindex(pname, pf)
+    PORTFOLIO_STATS.reindex(pname, pf)
+
 
+@router.post("/importcsv")
+async def importcsv(
+    portfolioname: str = Form(...),
+    file: UploadFile = File(...),
+):
+    pname = portfolioname.strip() or DEFAULT_PORTFOLIO
+
+    content = await file.read()
+    if not content:
+        return RedirectResponse(
+            url=f"/?portfolio={pname}&error=Uploaded CSV is empty.",
+            status_code=303,
+        )
+
+    text = content.decode("utf-8", errors="ignore")
+    reader = csv.DictReader(io.StringIO(text))
+
+    required_cols = [
+        "Symbol",
+        "Current Price",
+        "Trade Date",
+        "Purchase Price",
+        "Quantity",
+    ]
+    if not reader.fieldnames:
+        return RedirectResponse(
+            url=f"/?portfolio={pname}&error=CSV has no header row.",
+            status_code=303,
+        )
+    for col in required_cols:
+        if col not in reader.fieldnames:
+            return RedirectResponse(
+                url=f"/?portfolio={pname}&error=CSV missing required column {col}",
+                status_code=303,
+            )
+
+    positions, transactions = _parse_csv(reader, pname, "Imported from CSV")
+    _replace_portfolio(pname, positions, transactions)
+
+    bump_state_version()
     return RedirectResponse(url=f"/?portfolio={pname}", status_code=303)
 
 
@@ -142,6 +165,9 @@ async def importcsvmulti(
             status_code=303,
         )
 
+    # Parse every file first: a bad row in any of them rejects the batch
+    # before a single portfolio has changed.
+    parsed = []
     for pname, file in zip(names, files):
         pname = pname or DEFAULT_PORTFOLIO
         content = await file.read()
@@ -162,71 +188,13 @@ async def importcsvmulti(
             # Skip malformed CSV, do not stop whole batch
             continue
 
-        if pname not in PORTFOLIOS:
-            PORTFOLIOS[pname] = {
-                "tickers": [],
-                "positions": {},
-                "transactions": [],
-            }
-
-        pf = PORTFOLIOS[pname]
-        positions: Dict[str, Dict[str, float]] = {}
-        transactions: List[Dict] = []
-        PORTFOLIO_HISTORY[pname] = []
-        TAGS[pname] = {}
-
-        for row in reader:
-            symbol = (row["Symbol"] or "").strip().upper()
-            if not symbol:
-                continue
-
-            tradedate_raw = (row["Trade Date"] or "").strip()
-            buyprice = float(row["Purchase Price"] or 0.0)
-            qty = float(row["Quantity"] or 0.0)
-
-            if not tradedate_raw or len(tradedate_raw) != 8:
-                tradedt = datetime.now()
-            else:
-                try:
-                    tradedt = datetime.strptime(tradedate_raw, "%Y%m%d")
-                except Exception:
-                    tradedt = datetime.now()
-
-            pos = positions.get(symbol, {"qty": 0.0, "buy": 0.0})
-            oldqty = pos["qty"]
-            oldbuy = pos["buy"]
-
-            newqty = oldqty + qty
-            if newqty != 0:
-                if oldqty != 0:
-                    newbuy = (oldbuy * oldqty + buyprice * qty) / newqty
-                else:
-                    newbuy = buyprice
-            else:
-                newbuy = buyprice
-
-            pos["qty"] = newqty
-            pos["buy"] = newbuy
-            positions[symbol] = pos
-
-            transactions.append(
-                {
-                    "time": tradedt.strftime("%Y-%m-%d %H:%M:%S"),
-                    "portfolio": pname,
-                    "symbol": symbol,
-                    "action": "BUY",
-                    "qty": qty,
-                    "price": buyprice,
-                    "note": f"Imported from CSV bulk at {datetime.now().strftime('%Y-%m-%d %H:%M')}",
-                }
-            )
+        parsed.append((pname, *_parse_csv(reader, pname, "Imported from CSV bulk")))
 
-        pf["tickers"] = sorted(positions.keys())
-        pf["positions"] = positions
-        pf["transactions"] = transactions
-        rebuild_portfolio_history_from_transactions(pname)
+    for pname, positions, transactions in parsed:
+        _replace_portfolio(pname, positions, transactions)
 
     # After bulk import, redirect to the last portfolio in the list
+    bump_state_version()
     return RedirectResponse(url=f"/?portfolio={names[-1]}", status_code=303)
 
 
@@ -300,25 +268,16 @@ async def portfolioupload(
                 status_code=303,
             )
 
-    if pname not in PORTFOLIOS:
-        PORTFOLIOS[pname] = {
-            "tickers": [],
-            "positions": {},
-            "transactions": [],
-        }
-
-    pf = PORTFOLIOS[pname]
     positions: Dict[str, Dict[str, float]] = {}
     tickers: List[str] = []
     transactions: List[Dict] = []
-    TAGS[pname] = {}
 
-    for row in ws.iter_rows(min_row=2, values_only=True):
+    for row_no, row in enumerate(ws.iter_rows(min_row=2, values_only=True), 2):
         symbol = str(row[colmap["Symbol"]] or "").strip().upper()
         if not symbol:
             continue
-        buy = float(row[colmap["Purchase Price"]] or 0.0)
-        qty = float(row[colmap["Quantity"]] or 0.0)
+        buy = _number(row[colmap["Purchase Price"]], row_no, "Purchase Price")
+        qty = _number(row[colmap["Quantity"]], row_no, "Quantity")
 
         pos = positions.get(symbol, {"qty": 0.0, "buy": 0.0})
         oldqty = pos["qty"]
@@ -350,11 +309,19 @@ async def portfolioupload(
             }
         )
 
+    # Only now, with every row parsed, is the portfolio touched.
+    if pname not in PORTFOLIOS:
+        PORTFOLIOS[pname] = new_portfolio()
+    pf = PORTFOLIOS[pname]
+    TAGS[pname] = {}
     pf["tickers"] = sorted(set(tickers))
     pf["positions"] = positions
     pf["transactions"].extend(transactions)
     rebuild_portfolio_history_from_transactions(pname)
+    SYMBOL_INDEX.reindex(pname, pf)
+    PORTFOLIO_STATS.reindex(pname, pf)
 
+    bump_state_version()
     return RedirectResponse(url=f"/?portfolio={pname}", status_code=303)
 
 
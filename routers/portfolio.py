@@ -1,7 +1,15 @@
 from fastapi import APIRouter, Form
 from fastapi.responses import RedirectResponse
-from backup_utils import PORTFOLIOS, PORTFOLIO_HISTORY, DEFAULT_PORTFOLIO
+from backup_utils import (
+    PORTFOLIOS,
+    PORTFOLIO_HISTORY,
+    DEFAULT_PORTFOLIO,
+    bump_state_version,
+    new_portfolio,
+)
 from core.state import TAGS
+from core.portfolio_stats import PORTFOLIO_STATS
+from core.symbol_index import SYMBOL_INDEX
 
 router = APIRouter()
 
@@ -9,7 +17,9 @@ router = APIRouter()
 async def portfolio_add(name: str = Form(...)):
     new_name = name.strip()
     if new_name and new_name not in PORTFOLIOS:
-        PORTFOLIOS[new_name] = {"tickers": [], "positions": {}, "transactions": []}
+        PORTFOLIOS[new_name] = new_portfolio()
+        SYMBOL_INDEX.reindex(new_name, PORTFOLIOS[new_name])
+        bump_state_version()
     return RedirectResponse(url=f"/?portfolio={new_name}", status_code=303)
 
 
@@ -26,6 +36,9 @@ async def portfolio_rename(old_name: str = Form(...), new_name: str = Form(...))
             PORTFOLIO_HISTORY[new] = PORTFOLIO_HISTORY.pop(old)
         if old in TAGS:
             TAGS[new] = TAGS.pop(old)
+        SYMBOL_INDEX.rename(old, new)
+        PORTFOLIO_STATS.rename(old, new)
+        bump_state_version()
     return RedirectResponse(url=f"/?portfolio={new}", status_code=303)
 
 
@@ -37,6 +50,9 @@ async def portfolio_remove(name: str = Form(...)):
         PORTFOLIOS.pop(p_name)
         PORTFOLIO_HISTORY.pop(p_name, None)
         TAGS.pop(p_name, None)
+        SYMBOL_INDEX.drop(p_name)
+        PORTFOLIO_STATS.drop(p_name)
+        bump_state_version()
         if p_name == DEFAULT_PORTFOLIO:
             new_default = next(iter(PORTFOLIOS.keys()))
             DEFAULT_PORTFOLIO = new_default
@@ -63,5 +79,6 @@ async def set_summary_tag(
                 TAGS[p_name][sym] = val
         except ValueError:
             pass
+    bump_state_version()
     return RedirectResponse(url=f"/?portfolio={p_name}", status_code=303)
 
@@ -0,0 +1,25 @@
+from fastapi import APIRouter
+
+from core.circuit_breaker import QUOTE_BREAKER
+from core.price_poller import get_price_snapshot
+from core.quote_cache import QUOTE_CACHE
+from core.quote_providers import get_quote_provider
+
+router = APIRouter(prefix="/prices", tags=["prices"])
+
+
+@router.get("/stats")
+async def price_stats():
+    snapshot = get_price_snapshot()
+    return {
+        "cache": QUOTE_CACHE.stats(),
+        "provider": get_quote_provider().stats(),
+        "breaker": QUOTE_BREAKER.stats(),
+        "snapshot": {
+            "version": snapshot.version,
+            "updated_at": snapshot.updated_at,
+            "symbols": len(snapshot.symbols),
+            "priced": len(snapshot.prices),
+            "stale": len(snapshot.stale),
+        },
+    }
@@ -2,8 +2,16 @@ from fastapi import APIRouter, Form
 from fastapi.responses import RedirectResponse
 from datetime import datetime
 
-from backup_utils import PORTFOLIOS, DEFAULT_PORTFOLIO, rebuild_portfolio_history_from_transactions
+from backup_utils import (
+    PORTFOLIOS,
+    DEFAULT_PORTFOLIO,
+    add_transaction_to_history,
+    bump_state_version,
+    new_portfolio,
+)
 from core.state import TAGS
+from core.portfolio_stats import PORTFOLIO_STATS
+from core.symbol_index import SYMBOL_INDEX
 
 router = APIRouter()
 
@@ -13,11 +21,14 @@ async def add_ticker(portfolio: str = Form(...), symbol: str = Form(...)):
     p_name = portfolio.strip() or DEFAULT_PORTFOLIO
     symbol = symbol.strip().upper()
     if p_name not in PORTFOLIOS:
-        PORTFOLIOS[p_name] = {"tickers": [], "positions": {}, "transactions": []}
+        PORTFOLIOS[p_name] = new_portfolio()
     pf = PORTFOLIOS[p_name]
     if symbol and symbol not in pf["tickers"]:
         pf["tickers"].append(symbol)
         pf["tickers"].sort()
+    SYMBOL_INDEX.update(p_name, pf, symbol)
+    PORTFOLIO_STATS.update(p_name, pf, symbol)
+    bump_state_version()
     return RedirectResponse(url=f"/?portfolio={p_name}", status_code=303)
 
 
@@ -30,8 +41,11 @@ async def remove_ticker(portfolio: str = Form(...), symbol: str = Form(...)):
         if symbol in pf["tickers"]:
             pf["tickers"].remove(symbol)
         pf["positions"].pop(symbol, None)
+        SYMBOL_INDEX.update(p_name, pf, symbol)
+        PORTFOLIO_STATS.update(p_name, pf, symbol)
     if p_name in TAGS and symbol in TAGS[p_name]:
         TAGS[p_name].pop(symbol, None)
+    bump_state_version()
     return RedirectResponse(url=f"/?portfolio={p_name}", status_code=303)
 
 
@@ -46,7 +60,7 @@ async def buy(
     p_name = portfolio.strip() or DEFAULT_PORTFOLIO
     symbol = symbol.strip().upper()
     if p_name not in PORTFOLIOS:
-        PORTFOLIOS[p_name] = {"tickers": [], "positions": {}, "transactions": []}
+        PORTFOLIOS[p_name] = new_portfolio()
     pf = PORTFOLIOS[p_name]
 
     if symbol not in pf["tickers"]:
@@ -65,19 +79,22 @@ async def buy(
     pos["buy"] = new_buy
     pf["positions"][symbol] = pos
 
-    pf["transactions"].append(
-        {
-            "time": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-            "portfolio": p_name,
-            "symbol": symbol,
-            "action": "BUY",
-            "qty": qty,
-            "price": price,
-            "note": note,
-        }
-    )
-
-    rebuild_portfolio_history_from_transactions(p_name)
+    tx = {
+        "time": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "portfolio": p_name,
+        "symbol": symbol,
+        "action": "BUY",
+        "qty": qty,
+        "price": price,
+        "note": note,
+    }
+    pf["transactions"].append(tx)
+
+    add_transaction_to_history(p_name, tx)
+    SYMBOL_INDEX.update(p_name, pf, symbol)
+    PORTFOLIO_STATS.update(p_name, pf, symbol)
+    PORTFOLIO_STATS.add_transaction(p_name, pf, tx)
+    bump_state_version()
     return RedirectResponse(url=f"/?portfolio={p_name}", status_code=303)
 
 
@@ -92,7 +109,7 @@ async def sell(
     p_name = portfolio.strip() or DEFAULT_PORTFOLIO
     symbol = symbol.strip().upper()
     if p_name not in PORTFOLIOS:
-        PORTFOLIOS[p_name] = {"tickers": [], "positions": {}, "transactions": []}
+        PORTFOLIOS[p_name] = new_portfolio()
     pf = PORTFOLIOS[p_name]
 
     pos = pf["positions"].get(symbol, {"qty": 0.0, "buy": 0.0})
@@ -101,18 +118,21 @@ async def sell(
     pos["qty"] = new_qty
     pf["positions"][symbol] = pos
 
-    pf["transactions"].append(
-        {
-            "time": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-            "portfolio": p_name,
-            "symbol": symbol,
-            "action": "SELL",
-            "qty": qty,
-            "price": price,
-            "note": note,
-        }
-    )
-
-    rebuild_portfolio_history_from_transactions(p_name)
+    tx = {
+        "time": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "portfolio": p_name,
+        "symbol": symbol,
+        "action": "SELL",
+        "qty": qty,
+        "price": price,
+        "note": note,
+    }
+    pf["transactions"].append(tx)
+
+    add_transaction_to_history(p_name, tx)
+    SYMBOL_INDEX.update(p_name, pf, symbol)
+    PORTFOLIO_STATS.update(p_name, pf, symbol)
+    PORTFOLIO_STATS.add_transaction(p_name, pf, tx)
+    bump_state_version()
     return RedirectResponse(url=f"/?portfolio={p_name}", status_code=303)
 
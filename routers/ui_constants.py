@@ -154,6 +154,14 @@ STYLE_BLOCK = """
             color: #444;
             margin-top: 4px;
         }
+        .stale-price {
+            color: #8d6e63;
+            font-style: italic;
+        }
+        .stale-price::after {
+            content: " (stale)";
+            font-size: 10px;
+        }
         .total-pl {
             font-weight: bold;
             margin-top: 6px;
@@ -273,6 +281,13 @@ STYLE_BLOCK = """
             background: #fafafa;
             overflow: hidden;
         }
+        .history-pager {
+            display: flex;
+            gap: 10px;
+            margin-top: 4px;
+            font-size: 12px;
+            color: #666;
+        }
         .filter-row {
             font-size: 12px;
             color: #444;
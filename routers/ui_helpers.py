@@ -1,28 +1,58 @@
 # routers/ui_helpers.py
 
-from typing import Dict, List, Any, Tuple
-
-from backup_utils import PORTFOLIOS  # data store [file:525]
+import zlib
+from html import escape
+from typing import AbstractSet, Dict, List, Any, Mapping, Optional, Tuple
+from urllib.parse import quote, urlencode
+
+from backup_utils import PORTFOLIOS, history_version, state_version  # data store [file:525]
+from core.fragment_cache import FRAGMENT_CACHE, NO_PRICES
+from core.history_query import HISTORY_SORT_COLUMNS, HistoryPage, Sources, query_transactions
+from core.portfolio_stats import PORTFOLIO_STATS
+from core.sparkline import sparkline_symbol_id
+from core.symbol_index import SYMBOL_INDEX
+from core.templates import Template
 from core.state import TAGS  # per-symbol tags [file:525]
 from routers.ui_constants import TAG_LABELS  # semantic labels [file:525]
-
-
-def build_positions_rows(
-    pname: str,
+from routers.ui_templates import (
+    CHART_CARD,
+    HISTORY_EMPTY,
+    HISTORY_FILTER_FORM,
+    HISTORY_PAGER,
+    HISTORY_PAGER_LINK,
+    SIDEBAR_CARD,
+    STALE_PRICE,
+    SUMMARY_CELL,
+    SUMMARY_CELL_EMPTY,
+    SUMMARY_CELL_HEAD,
+    SUMMARY_CELL_TAIL,
+    SUMMARY_EMPTY,
+    SUMMARY_HEADER_CELL,
+    SUMMARY_ROW_OPEN,
+    SUMMARY_TAG_FILTER_CELL,
+    SUMMARY_TAG_OPTION,
+    SUMMARY_TAG_SELECT,
+    history_rows,
+    position_rows,
+)
+
+
+POSITION_SORT_COLUMNS = ["symbol", "price", "qty", "buy", "cost", "pl", "pl_pct"]
+
+
+def positions_data(
     tickers: List[str],
     positions: Dict[str, Dict[str, float]],
-    transactions: List[Dict[str, Any]],
+    last_note_for_symbol: Mapping[str, str],
     prices: Dict[str, float],
     sort_by: str,
     sort_dir: str,
-) -> Tuple[str, float]:
-    last_note_for_symbol: Dict[str, str] = {}
-    for tx in transactions:
-        sym = tx.get("symbol")
-        note_tx = tx.get("note")
-        if sym and note_tx:
-            last_note_for_symbol[sym] = note_tx
-
+    stale_symbols: AbstractSet[str] = frozenset(),
+) -> Tuple[List[Dict[str, Any]], float]:
+    """
+    Sorted position rows (raw values) and the portfolio's total P/L.
+    `last_note_for_symbol` is the portfolio's PortfolioStats.latest_notes.
+    """
     rows_data: List[Dict[str, Any]] = []
     total_pl = 0.0
 
@@ -44,23 +74,21 @@ def build_positions_rows(
             pl_pct = (pl / cost_basis * 100.0) if cost_basis != 0 else 0.0
             total_pl += pl or 0.0
 
-        note_str = last_note_for_symbol.get(symbol, "")
-
         rows_data.append(
             {
                 "symbol": symbol,
                 "price": price,
+                "stale": price is not None and symbol in stale_symbols,
                 "qty": qty,
                 "buy": buy,
                 "cost_basis": cost_basis,
                 "pl": pl,
                 "pl_pct": pl_pct,
-                "note": note_str,
+                "note": last_note_for_symbol.get(symbol, ""),
             }
         )
 
-    valid_sort_by = ["symbol", "price", "qty", "buy", "cost", "pl", "pl_pct"]
-    if sort_by not in valid_sort_by:
+    if sort_by not in POSITION_SORT_COLUMNS:
         sort_by = "symbol"
     if sort_dir not in ["asc", "desc"]:
         sort_dir = "asc"
@@ -83,25 +111,36 @@ def build_positions_rows(
         return row["symbol"] or ""
 
     rows_data.sort(key=sort_key, reverse=(sort_dir == "desc"))
+    return rows_data, total_pl
+
+
+def build_positions_rows(
+    pname: str,
+    tickers: List[str],
+    positions: Dict[str, Dict[str, float]],
+    last_note_for_symbol: Mapping[str, str],
+    prices: Dict[str, float],
+    sort_by: str,
+    sort_dir: str,
+    stale_symbols: AbstractSet[str] = frozenset(),
+) -> Tuple[str, float]:
+    rows_data, total_pl = positions_data(
+        tickers, positions, last_note_for_symbol, prices, sort_by, sort_dir, stale_symbols
+    )
 
-    rows_html = ""
+    rendered: List[Dict[str, str]] = []
     for row in rows_data:
-        symbol = row["symbol"]
         price = row["price"]
         qty = row["qty"]
         buy = row["buy"]
-        cost_basis = row["cost_basis"]
-        pl = row["pl"]
-        pl_pct = row["pl_pct"]
-        note_str = row["note"]
 
         if price is not None and qty is not None and buy is not None:
             price_str = f"{price:.2f}"
             qty_str = f"{qty:g}"
             buy_str = f"{buy:.2f}"
-            total_cost_str = f"{cost_basis:.2f}"
-            pl_str = f"{pl:.2f}"
-            pl_pct_str = f"{pl_pct:.2f}"
+            total_cost_str = f"{row['cost_basis']:.2f}"
+            pl_str = f"{row['pl']:.2f}"
+            pl_pct_str = f"{row['pl_pct']:.2f}"
         else:
             price_str = f"{price:.2f}" if price is not None else "NA"
             qty_str = "-" if qty is None else f"{qty:g}"
@@ -110,301 +149,349 @@ def build_positions_rows(
             pl_str = "-"
             pl_pct_str = "-"
 
-        rows_html += f"""
-        <tr class="ticker-row" data-symbol="{symbol}">
-            <td><a href="https://ca.finance.yahoo.com/quote/{symbol}" target="_blank">{symbol}</a></td>
-            <td>{price_str}</td>
-            <td>{qty_str}</td>
-            <td>{buy_str}</td>
-            <td>{total_cost_str}</td>
-            <td>{pl_str}</td>
-            <td>{pl_pct_str}</td>
-            <td>{note_str}</td>
-            <td class="trade-cell">
-                <form method="post" class="trade-form">
-                    <input type="hidden" name="portfolio" value="{pname}">
-                    <input type="hidden" name="symbol" value="{symbol}">
-                    <input type="number" step="0.0001" name="qty" placeholder="Qty" class="trade-input qty">
-                    <input type="number" step="0.01" name="price" placeholder="Price" class="trade-input price">
-                    <input type="text" name="note" placeholder="Note" class="trade-input note">
-                    <button type="submit" formaction="/buy">Buy</button>
-                    <button type="submit" formaction="/sell">Sell</button>
-                </form>
-            </td>
-        </tr>
-        """
-
-    return rows_html, total_pl
-
-
-def build_history_rows(
-    transactions: List[Dict[str, Any]],
+        if row["stale"]:
+            price_str = STALE_PRICE.render(price=price_str)
+
+        rendered.append(
+            {
+                "pname": pname,
+                "symbol": row["symbol"],
+                "price_str": price_str,
+                "qty_str": qty_str,
+                "buy_str": buy_str,
+                "total_cost_str": total_cost_str,
+                "pl_str": pl_str,
+                "pl_pct_str": pl_pct_str,
+                "note": row["note"],
+            }
+        )
+
+    return position_rows(rendered), total_pl
+
+
+def build_history_rows(page: HistoryPage, row_class: str) -> str:
+    rows = history_rows(page.rows, row_class)
+    if not rows:
+        rows = HISTORY_EMPTY
+    return rows
+
+
+def build_history_section(
+    pname: str,
+    prefix: str,
+    label: str,
+    sources: Sources,
     sort_by: str,
     sort_dir: str,
+    query: str,
+    cursor: Optional[str],
     row_class: str,
-) -> str:
-    valid_sort = ["time", "portfolio", "symbol", "action", "qty", "price"]
-    if sort_by not in valid_sort:
+) -> Dict[str, str]:
+    """
+    One page of a history table plus its filter form and pager. `prefix`
+    names the table's query parameters ("history" or "global").
+    """
+    if sort_by not in HISTORY_SORT_COLUMNS:
         sort_by = "time"
     if sort_dir not in ["asc", "desc"]:
         sort_dir = "desc"
+    page = query_transactions(sources, sort_by, sort_dir, query, cursor)
+    query = (query or "").strip()
+    q_param = f"&{prefix}_q={quote(query)}" if query else ""
+    base = f"/?portfolio={quote(pname)}&{prefix}_sort_by={sort_by}&{prefix}_sort_dir={sort_dir}{q_param}"
+
+    if query:
+        summary = f"{len(page.rows)} of {page.matched} matching ({page.total} total)"
+    else:
+        summary = f"{len(page.rows)} of {page.total}"
+    first_link = HISTORY_PAGER_LINK.render(href=base, label="First page") if cursor else ""
+    next_link = (
+        HISTORY_PAGER_LINK.render(href=f"{base}&{prefix}_cursor={page.next_cursor}", label="Next page")
+        if page.next_cursor
+        else ""
+    )
+    return {
+        "rows": build_history_rows(page, row_class),
+        "pager": HISTORY_PAGER.render(summary=summary, first_link=first_link, next_link=next_link),
+        "filter_form": HISTORY_FILTER_FORM.render(
+            pname=escape(pname),
+            prefix=prefix,
+            sort_by=sort_by,
+            sort_dir=sort_dir,
+            label=label,
+            query=escape(query),
+        ),
+        "q_param": q_param,
+    }
 
-    def key_fn(tx: Dict[str, Any]):
-        if sort_by == "time":
-            return tx["time"]
-        if sort_by == "portfolio":
-            return tx["portfolio"]
-        if sort_by == "symbol":
-            return tx["symbol"]
-        if sort_by == "action":
-            return tx["action"]
-        if sort_by == "qty":
-            return tx["qty"]
-        if sort_by == "price":
-            return tx["price"]
-        return tx["time"]
-
-    sorted_txs = sorted(transactions, key=key_fn, reverse=(sort_dir == "desc"))
-    rows = ""
-    for tx in sorted_txs:
-        rows += f"""
-        <tr class="{row_class}">
-            <td>{tx["time"]}</td>
-            <td>{tx["portfolio"]}</td>
-            <td>{tx["symbol"]}</td>
-            <td>{tx["action"]}</td>
-            <td>{tx["qty"]:g}</td>
-            <td>{tx["price"]:.2f}</td>
-            <td>{tx.get("note") or ""}</td>
-        </tr>
-        """
-    if not rows:
-        rows = """
-        <tr>
-            <td colspan="7" style="text-align:center;color:#666;">No transactions yet</td>
-        </tr>
-        """
-    return rows
 
+SUMMARY_SORT_COLUMNS = ["symbol", "qty", "cost", "pl", "pl_pct"]
 
-def build_summary(
+_EMPTY_SUMMARY_CELL = {
+    "has_pos": False,
+    "qty": None,
+    "buy": None,
+    "cost": None,
+    "pl_price": None,
+    "pl_pct": None,
+    "tag": None,
+}
+
+
+def _tag_display(tag_val: Optional[int]) -> str:
+    if tag_val is None or not (0 <= tag_val < len(TAG_LABELS)):
+        return ""
+    return TAG_LABELS[tag_val]
+
+
+# The tag <select> only varies by which option is selected, so there is one
+# bound template per choice with the options already folded in.
+SUMMARY_TAG_SELECTS: Dict[str, Template] = {
+    display: SUMMARY_TAG_SELECT.bind(
+        blank_selected="selected" if not display else "",
+        options=SUMMARY_TAG_OPTION.render_rows(
+            {"idx": idx, "label": label, "selected": "selected" if display == label else ""}
+            for idx, label in enumerate(TAG_LABELS)
+        ),
+    )
+    for display in ["", *TAG_LABELS]
+}
+
+
+def _summary_sort_key(summary_sort_by: str, cell: Optional[Dict[str, Any]]):
+    if not cell:
+        return float("-inf")
+    value = cell.get({"cost": "cost", "pl": "pl_price"}.get(summary_sort_by, summary_sort_by))
+    return value if value is not None else float("-inf")
+
+
+def summary_data(
     active_portfolio: str,
     portfolio_names: List[str],
-    prices_by_pf: Dict[str, Dict[str, float]],
+    prices: Dict[str, float],
     summary_sort_by: str,
     summary_sort_dir: str,
-) -> Dict[str, str]:
-    all_symbols = set()
-    for pf in PORTFOLIOS.values():
-        all_symbols.update(pf["tickers"])
-    all_symbols = sorted(all_symbols)
-
-    summary_data: List[Dict[str, Any]] = []
-    for sym in all_symbols:
-        row = {"symbol": sym, "cells": {}}
+) -> List[Dict[str, Any]]:
+    """
+    One row per symbol held anywhere, with a cell per portfolio, sorted by
+    the active portfolio's cell.
+    """
+    rows: List[Dict[str, Any]] = []
+    for sym in SYMBOL_INDEX.symbols():
+        holders = SYMBOL_INDEX.holders(sym)
+        price = prices.get(sym)
+        cells: Dict[str, Dict[str, Any]] = {}
         for pfname in portfolio_names:
-            pf = PORTFOLIOS[pfname]
-            pos = pf["positions"].get(sym)
+            if pfname not in holders:
+                cells[pfname] = dict(_EMPTY_SUMMARY_CELL)
+                continue
+            pos = PORTFOLIOS[pfname]["positions"][sym]
+            qty = pos["qty"]
+            buy = pos["buy"]
+            cost_basis = qty * buy
             cell = {
-                "has_pos": False,
-                "qty": None,
-                "buy": None,
-                "cost": None,
+                "has_pos": True,
+                "qty": qty,
+                "buy": buy,
+                "cost": cost_basis,
                 "pl_price": None,
                 "pl_pct": None,
-                "tag": None,
+                "tag": TAGS.get(pfname, {}).get(sym),
             }
-            if pos and pos.get("qty") is not None and pos.get("buy") is not None:
-                qty = pos["qty"]
-                buy = pos["buy"]
-                cost_basis = qty * buy
-                cell["has_pos"] = True
-                cell["qty"] = qty
-                cell["buy"] = buy
-                cell["cost"] = cost_basis
-                price_map = prices_by_pf.get(pfname, {})
-                price = price_map.get(sym)
-                if price is not None:
-                    current_value = price * qty
-                    pl_val = current_value - cost_basis
-                    pl_pct = pl_val / cost_basis * 100.0 if cost_basis != 0 else 0.0
-                    cell["pl_price"] = pl_val
-                    cell["pl_pct"] = pl_pct
-                tag_val = TAGS.get(pfname, {}).get(sym)
-                cell["tag"] = tag_val
-            row["cells"][pfname] = cell
-        summary_data.append(row)
-
-    valid_summary_sort = ["symbol", "qty", "cost", "pl", "pl_pct"]
-    if summary_sort_by not in valid_summary_sort:
+            if price is not None:
+                pl_val = price * qty - cost_basis
+                cell["pl_price"] = pl_val
+                cell["pl_pct"] = pl_val / cost_basis * 100.0 if cost_basis != 0 else 0.0
+            cells[pfname] = cell
+        rows.append({"symbol": sym, "cells": cells})
+
+    if summary_sort_by not in SUMMARY_SORT_COLUMNS:
         summary_sort_by = "symbol"
     if summary_sort_dir not in ["asc", "desc"]:
         summary_sort_dir = "asc"
 
-    def summary_key(row: Dict[str, Any]):
-        sym = row["symbol"]
-        cell = row["cells"].get(active_portfolio, {})
-        if summary_sort_by == "symbol":
-            return sym
-        if summary_sort_by == "qty":
-            return cell.get("qty") if cell.get("qty") is not None else float("-inf")
-        if summary_sort_by == "cost":
-            return cell.get("cost") if cell.get("cost") is not None else float("-inf")
-        if summary_sort_by == "pl":
-            return cell.get("pl_price") if cell.get("pl_price") is not None else float("-inf")
-        if summary_sort_by == "pl_pct":
-            return cell.get("pl_pct") if cell.get("pl_pct") is not None else float("-inf")
-        return sym
-
-    summary_data.sort(key=summary_key, reverse=(summary_sort_dir == "desc"))
-
-    summary_rows = ""
-    for row in summary_data:
-        sym = row["symbol"]
-        row_html = f'<tr class="summary-row" data-symbol="{sym}"><td class="summary-symbol">{sym}</td>'
-        for pfname in portfolio_names:
-            cell = row["cells"].get(pfname, {})
-            tag_val = cell.get("tag")
-            if cell.get("has_pos"):
-                qty = cell["qty"]
-                buy = cell["buy"]
-                cost_basis = cell["cost"]
-                pl_price = cell["pl_price"]
-                pl_pct = cell["pl_pct"]
-
-                qty_str = f"{qty:g}"
-                avg_str = f"{buy:.2f}"
-                cost_str = f"{cost_basis:.2f}"
-                if pl_price is not None and pl_pct is not None:
-                    pl_price_str = f"{pl_price:.2f}"
-                    pl_pct_str = f"{pl_pct:.2f}"
-                    pl_cell_str = f"{pl_price_str} ({pl_pct_str}%)"
-                else:
-                    pl_cell_str = "-"
-
-                if tag_val is None or not (0 <= tag_val < len(TAG_LABELS)):
-                    tag_display = ""
-                else:
-                    tag_display = TAG_LABELS[tag_val]
-
-                options_html = ""
-                for idx, label in enumerate(TAG_LABELS):
-                    selected_attr = "selected" if tag_display == label else ""
-                    options_html += f'<option value="{idx}" {selected_attr}>{label}</option>'
-
-                tag_select = f"""
-                <form method="post" action="/summary/tag" class="summary-tag-form">
-                    <input type="hidden" name="portfolio" value="{pfname}">
-                    <input type="hidden" name="symbol" value="{sym}">
-                    <select name="tag" class="summary-tag-select" onchange="this.form.submit()">
-                        <option value="" {'selected' if not tag_display else ''}></option>
-                        {options_html}
-                    </select>
-                </form>
-                """
-
-                cell_html = f"""
-                <span class="cell-part">Qty: {qty_str}</span>
-                <span class="cell-part">Avg: {avg_str}</span>
-                <span class="cell-part">Cost: {cost_str}</span>
-                <span class="cell-part">PL: {pl_cell_str}</span>
-                <span class="cell-part">Tag: {tag_select}</span>
-                """
-            else:
-                cell_html = '<span class="cell-empty"></span>'
+    if summary_sort_by == "symbol":
+        if summary_sort_dir == "desc":
+            rows.reverse()
+    else:
+        rows.sort(
+            key=lambda row: _summary_sort_key(summary_sort_by, row["cells"].get(active_portfolio)),
+            reverse=(summary_sort_dir == "desc"),
+        )
+    return rows
 
-            cell_tag_attr = ""
-            if tag_val is not None and 0 <= tag_val < len(TAG_LABELS):
-                cell_tag_attr = TAG_LABELS[tag_val]
 
-            row_html += (
-                f'<td class="summary-cell" data-pfname="{pfname}" '
-                f'data-tag="{cell_tag_attr}">{cell_html}</td>'
+def _summary_static_parts(portfolio_names: List[str]) -> Dict[str, Any]:
+    """
+    Everything in the summary table that does not depend on prices, cached
+    per state version. Each row is kept as the markup between its P/L
+    values plus the (portfolio, qty, cost) of each populated cell, so a
+    price refresh only formats one P/L per position held.
+    """
+    empty_cells = {
+        pfname: SUMMARY_CELL.render(pfname=pfname, tag="", cell_html=SUMMARY_CELL_EMPTY)
+        for pfname in portfolio_names
+    }
+    rows: Dict[str, Tuple[Tuple[str, ...], Tuple[Tuple[str, float, float], ...]]] = {}
+    for sym in SYMBOL_INDEX.symbols():
+        holders = SYMBOL_INDEX.holders(sym)
+        chunks: List[str] = []
+        held: List[Tuple[str, float, float]] = []
+        pending = [SUMMARY_ROW_OPEN.render(symbol=sym)]
+        for pfname in portfolio_names:
+            if pfname not in holders:
+                pending.append(empty_cells[pfname])
+                continue
+            pos = PORTFOLIOS[pfname]["positions"][sym]
+            qty = pos["qty"]
+            buy = pos["buy"]
+            cost_basis = qty * buy
+            tag_display = _tag_display(TAGS.get(pfname, {}).get(sym))
+            pending.append(
+                SUMMARY_CELL_HEAD.render(
+                    pfname=pfname,
+                    tag=tag_display,
+                    qty=f"{qty:g}",
+                    avg=f"{buy:.2f}",
+                    cost=f"{cost_basis:.2f}",
+                )
             )
+            chunks.append("".join(pending))
+            tag_select = SUMMARY_TAG_SELECTS[tag_display].render(pfname=pfname, symbol=sym)
+            pending = [SUMMARY_CELL_TAIL.render(tag_select=tag_select)]
+            held.append((pfname, qty, cost_basis))
+        pending.append("</tr>")
+        chunks.append("".join(pending))
+        rows[sym] = (tuple(chunks), tuple(held))
 
-        row_html += "</tr>"
-        summary_rows += row_html
+    return {
+        "rows": rows,
+        "header_cells": SUMMARY_HEADER_CELL.render_rows({"name": name} for name in portfolio_names),
+        "tag_filter_cells": SUMMARY_TAG_FILTER_CELL * len(portfolio_names),
+    }
 
-    if not summary_rows:
-        cols = len(portfolio_names) + 1
-        summary_rows = f"""
-        <tr>
-            <td colspan="{cols}" style="text-align:center;color:#666;">No positions in any portfolio</td>
-        </tr>
-        """
-
-    portfolio_header_cells = "".join(
-        f'<th class="summary-header summary-header-col" data-pfname="{name}">{name}</th>'
-        for name in portfolio_names
-    )
-    tag_filter_cells = "".join(
-        '<td><input type="text" class="summary-tag-filter" '
-        'placeholder="Tag labels, e.g. Buy, Sell" style="width:90px;"></td>'
-        for _ in portfolio_names
+
+def build_summary(
+    active_portfolio: str,
+    portfolio_names: List[str],
+    prices: Dict[str, float],
+    summary_sort_by: str,
+    summary_sort_dir: str,
+) -> Dict[str, str]:
+    static = FRAGMENT_CACHE.get_or_build(
+        "summary-static",
+        tuple(portfolio_names),
+        state_version(),
+        NO_PRICES,
+        lambda: _summary_static_parts(portfolio_names),
     )
+    if summary_sort_by not in SUMMARY_SORT_COLUMNS:
+        summary_sort_by = "symbol"
+    if summary_sort_dir not in ["asc", "desc"]:
+        summary_sort_dir = "asc"
+
+    # (html, active portfolio's cell) per row, in symbol order.
+    rendered: List[Tuple[str, Optional[Dict[str, Any]]]] = []
+    for sym, (chunks, held) in static["rows"].items():
+        if not held:
+            rendered.append((chunks[0], None))
+            continue
+        price = prices.get(sym)
+        active_cell = None
+        parts = [chunks[0]]
+        for i, (pfname, qty, cost_basis) in enumerate(held, 1):
+            if price is None:
+                pl_val = pl_pct = None
+                parts.append("-")
+            else:
+                pl_val = price * qty - cost_basis
+                pl_pct = pl_val / cost_basis * 100.0 if cost_basis != 0 else 0.0
+                parts.append(f"{pl_val:.2f} ({pl_pct:.2f}%)")
+            parts.append(chunks[i])
+            if pfname == active_portfolio:
+                active_cell = {"qty": qty, "cost": cost_basis, "pl_price": pl_val, "pl_pct": pl_pct}
+        rendered.append(("".join(parts), active_cell))
+
+    if summary_sort_by == "symbol":
+        if summary_sort_dir == "desc":
+            rendered.reverse()
+    else:
+        rendered.sort(
+            key=lambda row: _summary_sort_key(summary_sort_by, row[1]),
+            reverse=(summary_sort_dir == "desc"),
+        )
+    summary_rows = "".join([html for html, _ in rendered])
+
+    if not summary_rows:
+        summary_rows = SUMMARY_EMPTY.render(cols=len(portfolio_names) + 1)
 
     return {
         "rows": summary_rows,
-        "header_cells": portfolio_header_cells,
-        "tag_filter_cells": tag_filter_cells,
+        "header_cells": static["header_cells"],
+        "tag_filter_cells": static["tag_filter_cells"],
     }
 
 
-def build_sidebar_cards(
+def sidebar_data(
     portfolio_names: List[str],
-    prices_by_pf: Dict[str, Dict[str, float]],
-) -> str:
-    sidebar_cards = ""
+    prices: Dict[str, float],
+) -> List[Dict[str, Any]]:
+    """
+    Total value, cost and P/L per portfolio; unpriced positions count at
+    cost. Cost comes from the maintained PortfolioStats; only the value
+    needs a pass over the holdings, for their prices.
+    """
+    cards: List[Dict[str, Any]] = []
     for pfname in portfolio_names:
-        pf = PORTFOLIOS[pfname]
-        tickers = pf["tickers"]
-        positions = pf["positions"]
-        pf_prices = prices_by_pf.get(pfname, {})
+        pf = PORTFOLIOS.get(pfname)
+        if pf is None:
+            # Removed since the page read its list of names.
+            continue
+        stats = PORTFOLIO_STATS.get(pfname, pf)
+        total_cost = stats.total_cost
         total_value = 0.0
-        total_cost = 0.0
-        for sym in tickers:
-            pos = positions.get(sym)
-            if not pos:
-                continue
-            qty = pos.get("qty")
-            buy = pos.get("buy")
-            if qty is None or buy is None:
-                continue
-            cost_val = qty * buy
-            price_val = pf_prices.get(sym)
-            value_val = price_val * qty if price_val is not None else cost_val
-            total_cost += cost_val
-            total_value += value_val
-        pl_val = total_value - total_cost
-        value_str = f"{total_value:.2f}"
-        pl_str = f"{pl_val:.2f}"
-        pl_class = "pos" if pl_val >= 0 else "neg"
-        sidebar_cards += f"""
-        <div class="pf-card">
-            <div class="pf-title">{pfname}</div>
-            <div class="pf-line">
-                <span>Total value</span><span>{value_str}</span>
-            </div>
-            <div class="pf-line">
-                <span>Total PL</span><span class="{pl_class}">{pl_str}</span>
-            </div>
-        </div>
-        """
-    return sidebar_cards
+        for sym, (qty, cost_val) in stats.holdings.items():
+            price_val = prices.get(sym)
+            total_value += price_val * qty if price_val is not None else cost_val
+        cards.append(
+            {
+                "portfolio": pfname,
+                "total_value": total_value,
+                "total_cost": total_cost,
+                "pl": total_value - total_cost,
+            }
+        )
+    return cards
+
+
+def build_sidebar_cards(
+    portfolio_names: List[str],
+    prices: Dict[str, float],
+) -> str:
+    return SIDEBAR_CARD.render_rows(
+        {
+            "pfname": card["portfolio"],
+            "value": f"{card['total_value']:.2f}",
+            "pl": f"{card['pl']:.2f}",
+            "pl_class": "pos" if card["pl"] >= 0 else "neg",
+        }
+        for card in sidebar_data(portfolio_names, prices)
+    )
 
 
 def build_charts_html(portfolio_names: List[str]) -> str:
-    charts_html = ""
-    for pfname in portfolio_names:
-        charts_html += f"""
-        <div class="chart-placeholder">
-            <div class="chart-title">{pfname} growth</div>
-            <div class="chart-box">
-                <img src="/chart/{pfname}" alt="{pfname} chart" style="max-width:100%;max-height:100%;">
-            </div>
-        </div>
-        """
-    return charts_html
+    # One sprite request for every chart; the v= token changes with any
+    # history, so the browser never shows a stale sprite.
+    versions = "-".join(str(history_version(n)) for n in portfolio_names)
+    # One portfolios= parameter per name, so names may contain commas.
+    sprite_url = "/sparklines?" + urlencode(
+        {"portfolios": portfolio_names, "v": f"{zlib.crc32(versions.encode()):08x}"},
+        doseq=True,
+    )
+    return CHART_CARD.render_rows(
+        {"pfname": pfname, "sprite_url": sprite_url, "symbol_id": sparkline_symbol_id(i)}
+        for i, pfname in enumerate(portfolio_names)
+    )
 
 
 def toggle_col(current_by: str, current_dir: str, col: str) -> str:
@@ -0,0 +1,554 @@
+# routers/ui_templates.py
+#
+# HTML for the main page, built once at import. Placeholders use
+# str.format syntax ({{ and }} are literal braces, as in the inline JS).
+# The bodies of the big tables are rendered by plain functions that put
+# each row's values between the markup's literal fragments and join the
+# whole table once, as they run per row.
+
+from typing import Any, Iterable, List, Mapping
+
+from core.templates import Template, fragments
+from routers.ui_constants import STYLE_BLOCK
+
+POSITION_ROW = """
+        <tr class="ticker-row" data-symbol="{symbol}">
+            <td><a href="https://ca.finance.yahoo.com/quote/{symbol}" target="_blank">{symbol}</a></td>
+            <td>{price_str}</td>
+            <td>{qty_str}</td>
+            <td>{buy_str}</td>
+            <td>{total_cost_str}</td>
+            <td>{pl_str}</td>
+            <td>{pl_pct_str}</td>
+            <td>{note}</td>
+            <td class="trade-cell">
+                <form method="post" class="trade-form">
+                    <input type="hidden" name="portfolio" value="{pname}">
+                    <input type="hidden" name="symbol" value="{symbol}">
+                    <input type="number" step="0.0001" name="qty" placeholder="Qty" class="trade-input qty">
+                    <input type="number" step="0.01" name="price" placeholder="Price" class="trade-input price">
+                    <input type="text" name="note" placeholder="Note" class="trade-input note">
+                    <button type="submit" formaction="/buy">Buy</button>
+                    <button type="submit" formaction="/sell">Sell</button>
+                </form>
+            </td>
+        </tr>
+        """
+
+_POSITION_ROW_PARTS = fragments(
+    POSITION_ROW,
+    ("symbol", "symbol", "symbol", "price_str", "qty_str", "buy_str",
+     "total_cost_str", "pl_str", "pl_pct_str", "note", "pname", "symbol"),
+)
+
+
+def position_rows(rows: Iterable[Mapping[str, Any]]) -> str:
+    """The positions table body, one POSITION_ROW per row mapping."""
+    l0, l1, l2, l3, l4, l5, l6, l7, l8, l9, l10, l11, l12 = _POSITION_ROW_PARTS
+    out: List[str] = []
+    extend = out.extend
+    for row in rows:
+        symbol = row["symbol"]
+        extend((
+            l0, symbol, l1, symbol, l2, symbol, l3, row["price_str"], l4, row["qty_str"],
+            l5, row["buy_str"], l6, row["total_cost_str"], l7, row["pl_str"], l8, row["pl_pct_str"],
+            l9, row["note"], l10, row["pname"], l11, symbol, l12,
+        ))
+    return "".join(out)
+
+
+STALE_PRICE = Template(
+    '<span class="stale-price" title="Last known price, live quote unavailable">{price}</span>'
+)
+
+HISTORY_ROW = """
+        <tr class="{row_class}">
+            <td>{time}</td>
+            <td>{portfolio}</td>
+            <td>{symbol}</td>
+            <td>{action}</td>
+            <td>{qty}</td>
+            <td>{price}</td>
+            <td>{note}</td>
+        </tr>
+        """
+
+_HISTORY_ROW_PARTS = fragments(
+    HISTORY_ROW, ("row_class", "time", "portfolio", "symbol", "action", "qty", "price", "note")
+)
+
+
+def history_rows(rows: Iterable[Mapping[str, Any]], row_class: str) -> str:
+    """A history table body, one HISTORY_ROW per transaction record."""
+    l0, l1, l2, l3, l4, l5, l6, l7, l8 = _HISTORY_ROW_PARTS
+    head = l0 + row_class + l1
+    out: List[str] = []
+    extend = out.extend
+    for row in rows:
+        extend((
+            head, row["time"], l2, row["portfolio"], l3, row["symbol"], l4, row["action"],
+            l5, f"{row['qty']:g}", l6, f"{row['price']:.2f}", l7, row["note"], l8,
+        ))
+    return "".join(out)
+
+
+HISTORY_EMPTY = """
+        <tr>
+            <td colspan="7" style="text-align:center;color:#666;">No transactions yet</td>
+        </tr>
+        """
+
+# Server-side filter for a history table; `prefix` is "history" or "global".
+HISTORY_FILTER_FORM = Template("""<form method="get" action="/" class="filter-row">
+                <input type="hidden" name="portfolio" value="{pname}">
+                <input type="hidden" name="{prefix}_sort_by" value="{sort_by}">
+                <input type="hidden" name="{prefix}_sort_dir" value="{sort_dir}">
+                <label>{label}</label>
+                <input type="text" name="{prefix}_q" value="{query}" placeholder="Any text in row">
+                <input type="submit" value="Filter">
+            </form>""")
+
+HISTORY_PAGER = Template("""<div class="history-pager">
+                {summary}
+                {first_link}
+                {next_link}
+            </div>""")
+
+HISTORY_PAGER_LINK = Template('<a href="{href}">{label}</a>')
+
+SUMMARY_ROW_OPEN = Template(
+    '<tr class="summary-row" data-symbol="{symbol}"><td class="summary-symbol">{symbol}</td>'
+)
+
+SUMMARY_CELL = Template(
+    '<td class="summary-cell" data-pfname="{pfname}" data-tag="{tag}">{cell_html}</td>'
+)
+
+SUMMARY_CELL_EMPTY = '<span class="cell-empty"></span>'
+
+SUMMARY_TAG_OPTION = Template('<option value="{idx}" {selected}>{label}</option>')
+
+SUMMARY_TAG_SELECT = Template("""
+                <form method="post" action="/summary/tag" class="summary-tag-form">
+                    <input type="hidden" name="portfolio" value="{pfname}">
+                    <input type="hidden" name="symbol" value="{symbol}">
+                    <select name="tag" class="summary-tag-select" onchange="this.form.submit()">
+                        <option value="" {blank_selected}></option>
+                        {options}
+                    </select>
+                </form>
+                """)
+
+# A populated cell is split around its P/L value: head and tail depend only
+# on portfolio state and are cached, the P/L is formatted per price snapshot.
+SUMMARY_CELL_HEAD = Template(
+    '<td class="summary-cell" data-pfname="{pfname}" data-tag="{tag}">'
+    """
+                <span class="cell-part">Qty: {qty}</span>
+                <span class="cell-part">Avg: {avg}</span>
+                <span class="cell-part">Cost: {cost}</span>
+                <span class="cell-part">PL: """
+)
+
+SUMMARY_CELL_TAIL = Template("""</span>
+                <span class="cell-part">Tag: {tag_select}</span>
+                </td>""")
+
+SUMMARY_EMPTY = Template("""
+        <tr>
+            <td colspan="{cols}" style="text-align:center;color:#666;">No positions in any portfolio</td>
+        </tr>
+        """)
+
+SUMMARY_HEADER_CELL = Template(
+    '<th class="summary-header summary-header-col" data-pfname="{name}">{name}</th>'
+)
+
+SUMMARY_TAG_FILTER_CELL = (
+    '<td><input type="text" class="summary-tag-filter" '
+    'placeholder="Tag labels, e.g. Buy, Sell" style="width:90px;"></td>'
+)
+
+SIDEBAR_CARD = Template("""
+        <div class="pf-card">
+            <div class="pf-title">{pfname}</div>
+            <div class="pf-line">
+                <span>Total value</span><span>{value}</span>
+            </div>
+            <div class="pf-line">
+                <span>Total PL</span><span class="{pl_class}">{pl}</span>
+            </div>
+        </div>
+        """)
+
+CHART_CARD = Template("""
+        <div class="chart-placeholder">
+            <div class="chart-title">{pfname} growth</div>
+            <div class="chart-box">
+                <svg role="img" aria-label="{pfname} chart" style="width:100%;height:100%;">
+                    <use href="{sprite_url}#{symbol_id}" width="100%" height="100%"/>
+                </svg>
+            </div>
+        </div>
+        """)
+
+PORTFOLIO_OPTION = Template('<option value="{name}" {selected}>{name}</option>')
+
+ERROR_BOX = Template('<div class="error-box">{error}</div>')
+
+# The main page in the order it is streamed: header, positions and
+# sidebar first, then the summary and the two history tables as each is
+# computed. Concatenated, the sections are the whole document.
+PAGE_TOP = Template("""<!DOCTYPE html>
+<html>
+<head>
+    <title>Portfolio Manager</title>
+    <meta http-equiv="refresh" content="120">
+    {STYLE_BLOCK}
+</head>
+<body>
+<div class="page-root">
+    <div class="top-header">
+        <h1>Portfolio Manager</h1>
+        <div class="updated">
+            Auto-refreshes every 120 seconds. Data: Finnhub.io.
+        </div>
+        {error_block}
+    </div>
+
+    <div class="top-layout">
+        <div class="top-main">
+            <div class="controls">
+                <div class="controls-header">
+                    <h3 style="margin:0;">Portfolios</h3>
+                    <button type="button" class="controls-toggle-btn" id="toggle-extra-btn">More actions</button>
+                </div>
+                <div class="controls-main">
+                    <form method="get" action="/">
+                        <label>Active</label>
+                        <select name="portfolio" onchange="this.form.submit()">
+                            {portfolio_options}
+                        </select>
+                    </form>
+
+                    <form method="post" action="/add">
+                        <input type="hidden" name="portfolio" value="{pname}">
+                        <label>Add ticker</label>
+                        <input type="text" name="symbol" placeholder="e.g. NVDA" required style="width:80px;">
+                        <input type="submit" value="Add">
+                    </form>
+
+                    <form method="post" action="/remove">
+                        <input type="hidden" name="portfolio" value="{pname}">
+                        <label>Remove ticker</label>
+                        <input type="text" name="symbol" placeholder="e.g. MSFT" required style="width:80px;">
+                        <input type="submit" value="Remove">
+                    </form>
+                </div>
+
+                <div class="filter-row" style="margin-top:0;">
+                    <label>Filter tickers</label>
+                    <input type="text" id="ticker-filter" placeholder="e.g. NVDA, AAPL">
+                </div>
+
+                <div class="controls-extra" id="controls-extra">
+                    <div style="margin-top:2px;font-size:11px;color:#666;">
+                        Portfolio management
+                    </div>
+
+                    <div style="margin:2px 0 4px 0;font-size:11px;">
+                        <a href="/config/summary-order" target="_blank">
+                            Change portfolio order
+                        </a>
+                    </div>
+
+                    <form method="post" action="/portfolio/add">
+                        <label>Add portfolio</label>
+                        <input type="text" name="name" placeholder="Name" required style="width:90px;">
+                        <input type="submit" value="Add">
+                    </form>
+
+                    <form method="post" action="/portfolio/rename">
+                        <input type="hidden" name="oldname" value="{pname}">
+                        <label>Rename</label>
+                        <input type="text" name="newname" placeholder="Name" required style="width:90px;">
+                        <input type="submit" value="Rename">
+                    </form>
+
+                    <form method="post" action="/portfolio/remove" onsubmit="return confirm('Remove portfolio?');">
+                        <input type="hidden" name="name" value="{pname}">
+                        <input type="submit" value="Remove portfolio">
+                    </form>
+
+                    <div style="margin-top:6px;font-size:11px;color:#666;">
+                        Import / export portfolio
+                    </div>
+
+                    <form method="get" action="/portfolio/download">
+                        <input type="hidden" name="portfolio" value="{pname}">
+                        <input type="submit" value="Download XLSX">
+                    </form>
+
+                    <form method="post" action="/portfolio/upload" enctype="multipart/form-data">
+                        <input type="hidden" name="portfolio" value="{pname}">
+                        <label>Upload XLSX</label>
+                        <input type="file" name="file" accept=".xlsx" required>
+                        <input type="submit" value="Upload">
+                    </form>
+
+                    <form method="get" action="/portfolio/exportcsv">
+                        <input type="hidden" name="portfolio" value="{pname}">
+                        <input type="submit" value="Export CSV">
+                    </form>
+
+                    <form method="post" action="/importcsv" enctype="multipart/form-data">
+                        <input type="hidden" name="portfolioname" value="{pname}">
+                        <label>Import CSV into active</label>
+                        <input type="file" name="file" accept=".csv" required>
+                        <input type="submit" value="Import CSV">
+                    </form>
+
+                    <div style="margin-top:6px;font-size:11px;color:#666;">
+                        Bulk CSV import (one click)
+                    </div>
+
+                    <form method="post" action="/importcsvmulti" enctype="multipart/form-data">
+                        <div style="font-size:11px;color:#444;margin-bottom:2px;">
+                            Enter portfolio names comma separated, order matches selected CSVs.
+                        </div>
+                        <input type="text" name="portfolionames"
+                               placeholder="Watch list, RRSP, TFSA"
+                               style="width:260px;font-size:11px;"><br>
+                        <input type="file" name="files" accept=".csv" multiple required>
+                        <input type="submit" value="Import all CSVs">
+                    </form>
+
+                    <div style="margin-top:6px;font-size:11px;color:#666;">
+                        Global JSON backup
+                    </div>
+
+                    <form method="post" action="/backup/create" class="backup-btn">
+                        <input type="submit" value="Create JSON backup">
+                    </form>
+
+                    <form method="post" action="/backup/restore" enctype="multipart/form-data" class="backup-btn">
+                        <label>Restore JSON</label>
+                        <input type="file" name="file" accept=".json" required>
+                        <input type="submit" value="Restore">
+                    </form>
+
+                    <div class="tickers-list">
+                        <strong>Current portfolio:</strong> {pname} |
+                        <strong>Tickers:</strong> {current_list}
+                    </div>
+                </div>
+            </div>
+
+            <div class="panel">
+                <h2>{pname} positions</h2>
+                <table id="positions-table">
+                    <tr>
+                        <th>
+                            <a href="/?portfolio={pname}&sort_by=symbol&sort_dir={toggle_symbol}">Ticker</a>
+                        </th>
+                        <th>
+                            <a href="/?portfolio={pname}&sort_by=price&sort_dir={toggle_price}">Current price</a>
+                        </th>
+                        <th>
+                            <a href="/?portfolio={pname}&sort_by=qty&sort_dir={toggle_qty}">Qty</a>
+                        </th>
+                        <th>
+                            <a href="/?portfolio={pname}&sort_by=buy&sort_dir={toggle_buy}">Buy price</a>
+                        </th>
+                        <th>
+                            <a href="/?portfolio={pname}&sort_by=cost&sort_dir={toggle_cost}">Total cost</a>
+                        </th>
+                        <th>
+                            <a href="/?portfolio={pname}&sort_by=pl&sort_dir={toggle_pl}">P/L</a>
+                        </th>
+                        <th>
+                            <a href="/?portfolio={pname}&sort_by=pl_pct&sort_dir={toggle_pl_pct}">P/L %</a>
+                        </th>
+                        <th>Note</th>
+                        <th>Trade</th>
+                    </tr>
+                    {rows_html}
+                </table>
+                <div class="total-pl">
+                    Total P/L (all tickers in {pname}): {total_pl_str}
+                </div>
+            </div>
+        </div>
+
+        <div class="sidebar">
+            <div class="sidebar-card-wrapper">
+                <div class="sidebar-title">Today summary</div>
+                {sidebar_cards}
+            </div>
+            <div class="charts-wrapper">
+                <div class="charts-title">Portfolio growth</div>
+                {charts_html}
+            </div>
+        </div>
+    </div>
+
+""", STYLE_BLOCK=STYLE_BLOCK)
+
+PAGE_SUMMARY = Template("""    <div class="bottom-layout">
+        <div class="panel summary-wrapper">
+            <h3>Portfolios summary (all portfolios)</h3>
+            <div class="filter-row">
+                <label>Filter summary (text: tickers or any text, comma separated)</label>
+                <input type="text" id="summary-filter" placeholder="e.g. MA, AXP, AMD">
+            </div>
+            <table id="summary-table">
+                <tr>
+                    <th class="summary-header">
+                        <a href="/?portfolio={pname}&summary_sort_by=symbol&summary_sort_dir={summary_toggle_symbol}">Ticker</a>
+                    </th>
+                    {summary_header_cells}
+                </tr>
+                <tr class="summary-tag-filter-row">
+                    <td style="font-weight:bold;">Tag filter per portfolio, use labels e.g. Buy, Sell, Review Thesis</td>
+                    {summary_tag_filter_cells}
+                </tr>
+                {summary_rows}
+            </table>
+        </div>
+
+""")
+
+PAGE_HISTORY = Template("""        <div class="panel">
+            <h3>{pname} history</h3>
+            {history_filter_form}
+            <table id="history-table">
+                <tr>
+                    <th><a href="/?portfolio={pname}&history_sort_by=time&history_sort_dir={hist_toggle_time}{history_q_param}">Time</a></th>
+                    <th><a href="/?portfolio={pname}&history_sort_by=portfolio&history_sort_dir={hist_toggle_portfolio}{history_q_param}">Portfolio</a></th>
+                    <th><a href="/?portfolio={pname}&history_sort_by=symbol&history_sort_dir={hist_toggle_symbol}{history_q_param}">Ticker</a></th>
+                    <th><a href="/?portfolio={pname}&history_sort_by=action&history_sort_dir={hist_toggle_action}{history_q_param}">Action</a></th>
+                    <th><a href="/?portfolio={pname}&history_sort_by=qty&history_sort_dir={hist_toggle_qty}{history_q_param}">Qty</a></th>
+                    <th><a href="/?portfolio={pname}&history_sort_by=price&history_sort_dir={hist_toggle_price}{history_q_param}">Price</a></th>
+                    <th>Note</th>
+                </tr>
+                {history_rows}
+            </table>
+            {history_pager}
+        </div>
+
+""")
+
+PAGE_GLOBAL_HISTORY = Template("""        <div class="panel">
+            <h3>All portfolios history</h3>
+            {global_filter_form}
+            <table id="global-history-table">
+                <tr>
+                    <th><a href="/?portfolio={pname}&global_sort_by=time&global_sort_dir={glob_toggle_time}{global_q_param}">Time</a></th>
+                    <th><a href="/?portfolio={pname}&global_sort_by=portfolio&global_sort_dir={glob_toggle_portfolio}{global_q_param}">Portfolio</a></th>
+                    <th><a href="/?portfolio={pname}&global_sort_by=symbol&global_sort_dir={glob_toggle_symbol}{global_q_param}">Ticker</a></th>
+                    <th><a href="/?portfolio={pname}&global_sort_by=action&global_sort_dir={glob_toggle_action}{global_q_param}">Action</a></th>
+                    <th><a href="/?portfolio={pname}&global_sort_by=qty&global_sort_dir={glob_toggle_qty}{global_q_param}">Qty</a></th>
+                    <th><a href="/?portfolio={pname}&global_sort_by=price&global_sort_dir={glob_toggle_price}{global_q_param}">Price</a></th>
+                    <th>Note</th>
+                </tr>
+                {global_history_rows}
+            </table>
+            {global_history_pager}
+        </div>
+    </div>
+</div>
+<script>
+    (function() {{
+        const btn = document.getElementById('toggle-extra-btn');
+        const extra = document.getElementById('controls-extra');
+        if (!btn || !extra) return;
+        let visible = false;
+        btn.addEventListener('click', function() {{
+            visible = !visible;
+            extra.style.display = visible ? 'block' : 'none';
+            btn.textContent = visible ? 'Less actions' : 'More actions';
+        }});
+    }})();
+
+    (function() {{
+        const filterInput = document.getElementById('ticker-filter');
+        const table = document.getElementById('positions-table');
+        if (!filterInput || !table) return;
+        function applyFilter() {{
+            const val = filterInput.value.trim().toUpperCase();
+            const tokens = val.split(',').map(s => s.trim()).filter(Boolean);
+            const rows = table.querySelectorAll('tr.ticker-row');
+            if (tokens.length === 0) {{
+                rows.forEach(r => r.style.display = '');
+                return;
+            }}
+            rows.forEach(row => {{
+                const sym = (row.getAttribute('data-symbol') || '').toUpperCase();
+                const match = tokens.some(t => sym.includes(t));
+                row.style.display = match ? '' : 'none';
+            }});
+        }}
+        filterInput.addEventListener('input', applyFilter);
+    }})();
+
+    function parseTokens(str) {{
+        return str.split(',').map(s => s.trim().toUpperCase()).filter(Boolean);
+    }}
+
+    function applySummaryFilters() {{
+        const table = document.getElementById('summary-table');
+        if (!table) return;
+        const rows = table.querySelectorAll('tr.summary-row');
+        const headerCells = table.querySelectorAll('th.summary-header-col');
+        const tagFilters = table.querySelectorAll('.summary-tag-filter');
+        const summaryInput = document.getElementById('summary-filter');
+        const textTokens = summaryInput ? parseTokens(summaryInput.value) : [];
+
+        const activeTagFilters = [];
+        headerCells.forEach((th, idx) => {{
+            const pfName = th.getAttribute('data-pfname');
+            const input = tagFilters[idx];
+            if (!input) return;
+            const tokens = parseTokens(input.value);
+            if (tokens.length > 0) {{
+                activeTagFilters.push({{ pfName, tags: tokens }});
+            }}
+        }});
+
+        rows.forEach(row => {{
+            const symbol = (row.getAttribute('data-symbol') || '').toUpperCase();
+            let visible = true;
+            if (textTokens.length > 0) {{
+                const rowText = (row.textContent || row.innerText || '').toUpperCase();
+                const matchAny = textTokens.some(tok => symbol.includes(tok) || rowText.includes(tok));
+                if (!matchAny) visible = false;
+            }}
+            if (visible && activeTagFilters.length > 0) {{
+                for (const f of activeTagFilters) {{
+                    const cell = row.querySelector('td.summary-cell[data-pfname=\"' + f.pfName + '\"]');
+                    if (!cell) {{ visible = false; break; }}
+                    const tag = (cell.getAttribute('data-tag') || '').toUpperCase();
+                    if (!tag) {{ visible = false; break; }}
+                    if (!f.tags.some(t => tag.includes(t))) {{ visible = false; break; }}
+                }}
+            }}
+            row.style.display = visible ? '' : 'none';
+        }});
+    }}
+
+    (function() {{
+        const table = document.getElementById('summary-table');
+        if (!table) return;
+        const tagInputs = table.querySelectorAll('.summary-tag-filter');
+        tagInputs.forEach(inp => {{
+            inp.addEventListener('input', applySummaryFilters);
+        }});
+        const summaryInput = document.getElementById('summary-filter');
+        if (summaryInput) {{
+            summaryInput.addEventListener('input', applySummaryFilters);
+        }}
+    }})();
+</script>
+</body>
+</html>
+""")
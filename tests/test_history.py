@@ -0,0 +1,135 @@
+import random
+
+import numpy as np
+import pytest
+
+import backup_utils
+from backup_utils import (
+    PORTFOLIO_HISTORY,
+    PORTFOLIOS,
+    _running_cost,
+    _state_from_dict,
+    _state_to_dict,
+    add_transaction_to_history,
+    new_portfolio,
+)
+from core.columnar import HistorySeries, format_time, parse_time
+from core.timeseries import DAY, HISTORY_COMPACT_EVERY, downsample_history
+
+START = parse_time("2025-01-01 00:00:00")
+
+
+@pytest.fixture(autouse=True)
+def clean_state():
+    PORTFOLIOS.clear()
+    PORTFOLIO_HISTORY.clear()
+    yield
+    PORTFOLIOS.clear()
+    PORTFOLIO_HISTORY.clear()
+    backup_utils.DEFAULT_PORTFOLIO = "Default"
+
+
+def _trade(name, ts, action, qty, price):
+    tx = {
+        "time": format_time(ts),
+        "portfolio": name,
+        "symbol": "AAPL",
+        "action": action,
+        "qty": qty,
+        "price": price,
+        "note": "",
+    }
+    PORTFOLIOS[name]["transactions"].append(tx)
+    add_transaction_to_history(name, tx)
+
+
+def _incremental_with_poller_points(name, seed=1, steps=200):
+    """Trades and poller points interleaved; every tenth trade is backdated."""
+    rng = random.Random(seed)
+    PORTFOLIOS[name] = new_portfolio(["AAPL"])
+    ts = START
+    for i in range(steps):
+        ts += 60
+        if i % 3:
+            PORTFOLIO_HISTORY[name].append(ts, rng.uniform(0, 10000))
+            continue
+        when = ts - rng.randint(1, 200) * 60 - 30 if i % 10 == 0 and i else ts
+        _trade(name, when, rng.choice(["BUY", "BUY", "SELL"]), rng.randint(1, 20), rng.uniform(10, 200))
+    return PORTFOLIO_HISTORY[name]
+
+
+def _cost_as_rebuilt(name, times):
+    # The unsampled series a rebuild starts from: running cost per transaction.
+    tx_times, tx_costs = _running_cost(PORTFOLIOS[name]["transactions"])
+    tx_costs = np.concatenate(([0.0], tx_costs))
+    return tx_costs[np.searchsorted(tx_times, times, side="right")]
+
+
+def test_incremental_costs_match_rebuild_with_poller_points():
+    hist = _incremental_with_poller_points("P")
+    times, _ = hist.as_numpy()
+    costs = hist.costs_as_numpy()
+    assert np.all(np.diff(times) >= 0)
+    np.testing.assert_allclose(costs, _cost_as_rebuilt("P", times))
+
+
+def test_costs_stay_aligned_after_downsampling():
+    hist = _incremental_with_poller_points("P")
+    downsample_history(hist, now=START + 10 * DAY)
+    times, values = hist.as_numpy()
+    assert len(hist.costs) == len(times) == len(values)
+    np.testing.assert_allclose(hist.costs_as_numpy(), _cost_as_rebuilt("P", times))
+
+
+def test_backdated_trade_after_downsampling():
+    PORTFOLIOS["P"] = new_portfolio(["AAPL"])
+    _trade("P", START, "BUY", 1, 100.0)
+    _trade("P", START + 65, "BUY", 1, 100.0)
+    _trade("P", START + 70, "BUY", 1, 100.0)
+    PORTFOLIO_HISTORY["P"].append(START + 130, 500.0)
+    # One point per minute: the trade at +65 s is folded into the one at +70 s.
+    downsample_history(PORTFOLIO_HISTORY["P"], now=START + 2 * DAY)
+    assert len(PORTFOLIO_HISTORY["P"]) == 3
+
+    _trade("P", START + 66, "SELL", 1, 50.0)
+    times, _ = PORTFOLIO_HISTORY["P"].as_numpy()
+    assert PORTFOLIO_HISTORY["P"].costs_as_numpy().tolist() == [100.0, 150.0, 250.0, 250.0]
+    np.testing.assert_allclose(PORTFOLIO_HISTORY["P"].costs_as_numpy(), _cost_as_rebuilt("P", times))
+
+
+def test_poller_points_keep_market_value():
+    PORTFOLIOS["P"] = new_portfolio(["AAPL"])
+    _trade("P", START, "BUY", 10, 100.0)
+    PORTFOLIO_HISTORY["P"].append(START + 60, 1500.0)
+    _trade("P", START + 120, "BUY", 1, 100.0)
+
+    _, values = PORTFOLIO_HISTORY["P"].as_numpy()
+    assert values.tolist() == [1000.0, 1500.0, 1600.0]
+    assert PORTFOLIO_HISTORY["P"].costs_as_numpy().tolist() == [1000.0, 1000.0, 1100.0]
+
+
+def test_restore_fills_costs_missing_from_old_backups():
+    _incremental_with_poller_points("P")
+    data = _state_to_dict()
+    for rec in data["PORTFOLIO_HISTORY"]["P"]:
+        del rec["cost"]
+
+    _state_from_dict(data)
+    restored = PORTFOLIO_HISTORY["P"]
+    times, _ = restored.as_numpy()
+    assert len(times)
+    np.testing.assert_allclose(restored.costs_as_numpy(), _cost_as_rebuilt("P", times))
+
+
+
+def test_compaction_counts_appends_not_length():
+    # Old points that all fold into one daily bucket: compaction keeps
+    # bringing the length back down, so it would often sit on a multiple
+    # of HISTORY_COMPACT_EVERY.
+    old = START - 40 * DAY
+    hist = PORTFOLIO_HISTORY["P"] = HistorySeries([old] * 59, [0.0] * 59, [0.0] * 59)
+    compactions = 0
+    for _ in range(2 * HISTORY_COMPACT_EVERY):
+        backup_utils.update_portfolio_history_point("P", [], {}, {})
+        compactions += hist.appended == 0
+    assert compactions == 2
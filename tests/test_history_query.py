@@ -0,0 +1,130 @@
+import base64
+import json
+import random
+
+import pytest
+
+from core.columnar import TransactionLog, format_time, parse_time
+from core.history_query import HISTORY_SORT_COLUMNS, decode_cursor, encode_cursor, query_transactions
+
+START = parse_time("2025-01-01 00:00:00")
+
+
+def _log(owner, seed, n=40):
+    rng = random.Random(seed)
+    return TransactionLog.from_records(
+        {
+            # Coarse times so rows tie within and across portfolios.
+            "time": format_time(START + rng.randint(0, 20) * 60),
+            "portfolio": owner,
+            "symbol": rng.choice(["AAPL", "MSFT", "TECL"]),
+            "action": rng.choice(["BUY", "SELL"]),
+            "qty": float(rng.randint(1, 5)),
+            "price": float(rng.randint(10, 12)),
+            "note": rng.choice(["", "note-a", "note-b"]),
+        }
+        for _ in range(n)
+    )
+
+
+@pytest.fixture
+def sources():
+    return [("P", _log("P", 1)), ("Q", _log("Q", 2)), ("R", _log("R", 3, n=5))]
+
+
+def _expected(sources, sort_by, sort_dir, needle=""):
+    keys = []
+    for owner, log in sources:
+        column = log.times if sort_by == "time" else [log.record(i)[sort_by] for i in range(len(log))]
+        for i in range(len(log)):
+            rec = log.record(i)
+            text = f"{rec['time']} {owner} {rec['symbol']} {rec['action']} {rec['qty']:g} {rec['price']:.2f} {rec['note']}"
+            if needle.upper() in text.upper():
+                keys.append((column[i], log.times[i], owner, i))
+    keys.sort(reverse=sort_dir == "desc")
+    logs = dict(sources)
+    return [logs[owner].record(i) for _, _, owner, i in keys]
+
+
+def _all_pages(sources, sort_by, sort_dir, query="", limit=7):
+    rows, cursor, pages = [], None, 0
+    while True:
+        page = query_transactions(sources, sort_by, sort_dir, query, cursor, limit)
+        rows.extend(page.rows)
+        pages += 1
+        cursor = page.next_cursor
+        if cursor is None:
+            return rows, pages, page
+
+
+@pytest.mark.parametrize("sort_dir", ["asc", "desc"])
+@pytest.mark.parametrize("sort_by", HISTORY_SORT_COLUMNS)
+def test_paging_forward_through_mixed_portfolios(sources, sort_by, sort_dir):
+    rows, pages, last = _all_pages(sources, sort_by, sort_dir)
+    assert rows == _expected(sources, sort_by, sort_dir)
+    assert pages == -(-len(rows) // 7)
+    assert last.total == last.matched == 85
+
+
+@pytest.mark.parametrize("sort_by", ["time", "symbol", "qty"])
+def test_filter_with_cursor(sources, sort_by):
+    rows, _, last = _all_pages(sources, sort_by, "desc", query="Note-A", limit=3)
+    expected = _expected(sources, sort_by, "desc", "note-a")
+    assert rows == expected
+    assert all(row["note"] == "note-a" for row in rows)
+    assert last.matched == len(expected) < last.total
+
+
+def test_cursor_stays_valid_while_transactions_arrive(sources):
+    first = query_transactions(sources, "symbol", "asc", limit=10)
+    owner, log = sources[0]
+    log.append(
+        {
+            "time": format_time(START + 3600),
+            "portfolio": owner,
+            "symbol": "ZZZ",
+            "action": "BUY",
+            "qty": 1.0,
+            "price": 1.0,
+            "note": "",
+        }
+    )
+    # The sorted index cached for the old log version is not reused.
+    rows = list(first.rows)
+    cursor = first.next_cursor
+    while cursor is not None:
+        page = query_transactions(sources, "symbol", "asc", cursor=cursor, limit=10)
+        rows.extend(page.rows)
+        cursor = page.next_cursor
+    assert rows == _expected(sources, "symbol", "asc")
+    assert rows[-1]["symbol"] == "ZZZ"
+
+
+def _raw_cursor(data):
+    return base64.urlsafe_b64encode(json.dumps(data).encode()).decode().rstrip("=")
+
+
+@pytest.mark.parametrize(
+    "cursor",
+    [
+        "not a cursor!",
+        _raw_cursor({"symbol": "AAPL"}),
+        _raw_cursor(["symbol", None, 1.0, "P", 0]),
+        _raw_cursor(["symbol", 5, 1.0, "P", 0]),
+        _raw_cursor(["symbol", "AAPL", True, "P", 0]),
+        _raw_cursor(["symbol", "AAPL", 1.0, "P", False]),
+        _raw_cursor(["symbol", "AAPL", 1.0, None, 0]),
+        _raw_cursor(["time", 1.0, 1.0, "P", 0]),
+    ],
+)
+def test_malformed_cursor_is_ignored(sources, cursor):
+    assert decode_cursor(cursor, "symbol") is None
+    page = query_transactions(sources, "symbol", "asc", cursor=cursor, limit=5)
+    assert page.rows == _expected(sources, "symbol", "asc")[:5]
+
+
+def test_numeric_cursor_rejects_text_and_bool():
+    assert decode_cursor(_raw_cursor(["qty", "1", 1.0, "P", 0]), "qty") is None
+    assert decode_cursor(_raw_cursor(["qty", True, 1.0, "P", 0]), "qty") is None
+    key = (2.0, START, "P", 3)
+    assert decode_cursor(encode_cursor("qty", key), "qty") == key